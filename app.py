@@ -2,59 +2,213 @@
 Minimal Streamlit UI for Document Based Q&A.
 """
 
+import functools
+import hashlib
+import html
+import json
 import os
+import shutil
+import sqlite3
 import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import streamlit as st
 
-try:
+from src.config import RAG_WARMUP
+
+
+@functools.cache
+def _load_backend() -> None:
+    """
+    Import the RAG stack (torch, transformers, chromadb) on first use instead of
+    before the page paints. Call this before touching any of the names below.
+    """
+    global get_query_cache, normalize_question, get_generator, reset_generator
+    global clear_vectorstore, find_indexed_sources, ingest_documents
+    from src.cache.semantic_cache import get_query_cache, normalize_question
     from src.generator import get_generator, reset_generator
-    from src.ingestion import clear_vectorstore, ingest_documents
-except ImportError as e:
-    st.error(f"Import Error: {e}")
-    st.stop()
+    from src.ingestion import clear_vectorstore, find_indexed_sources, ingest_documents
 
 
 st.set_page_config(page_title="Document Based Q&A", page_icon="Q&A", layout="wide")
 
+# Identical submissions inside this window reuse the previous answer (double-clicks, repeated Enter).
+RESUBMIT_WINDOW_SECONDS = 2.0
+
+STATE_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".state", "session.db")
+
+
+@st.cache_resource(show_spinner=False)
+def _state_store() -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(STATE_DB_PATH), exist_ok=True)
+    conn = sqlite3.connect(STATE_DB_PATH, check_same_thread=False)
+    conn.execute("CREATE TABLE IF NOT EXISTS app_state (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+    return conn
+
+
+def _load_state(key: str, default):
+    try:
+        row = _state_store().execute("SELECT value FROM app_state WHERE key = ?", (key,)).fetchone()
+    except sqlite3.Error as exc:
+        print(f"[State] Could not read {key}: {exc}")
+        return default
+    return json.loads(row[0]) if row else default
+
+
+def _save_state(key: str, value) -> None:
+    try:
+        with _state_store() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO app_state (key, value) VALUES (?, ?)",
+                (key, json.dumps(value)),
+            )
+    except sqlite3.Error as exc:
+        print(f"[State] Could not persist {key}: {exc}")
+
+
 if "rag_generator" not in st.session_state:
     st.session_state.rag_generator = None
 if "latest_ingested_sources" not in st.session_state:
-    st.session_state.latest_ingested_sources = []
+    # Rehydrate after page reloads / server restarts so the source filter survives.
+    st.session_state.latest_ingested_sources = _load_state("latest_ingested_sources", [])
+
+
+@st.cache_resource(show_spinner=False)
+def _cached_generator():
+    # Shared by every session in this server process so models load once.
+    _load_backend()
+    generator = get_generator()
+    if RAG_WARMUP:
+        generator.warm_up()
+    return generator
+
+
+def _warm_generator(outcome: dict) -> None:
+    # Runs off the script thread, so it reports through `outcome` rather than st.session_state.
+    try:
+        _cached_generator()
+    except Exception as exc:
+        # Surfaced again (with UI) when the user submits a question.
+        print(f"[Warmup] Generator warm-up failed: {exc}")
+        outcome["error"] = str(exc)
+
+
+def _start_warmup() -> None:
+    st.session_state._warmup_outcome = {}
+    if not RAG_WARMUP:
+        st.session_state._warmup = None
+        return
+    st.session_state._warmup = threading.Thread(
+        target=_warm_generator, args=(st.session_state._warmup_outcome,), daemon=True
+    )
+    st.session_state._warmup.start()
+
+
+def _warmup_pending() -> bool:
+    """
+    True while the background load runs, and always when warm-up is disabled
+    (the engine then loads on the first question).
+    """
+    warmup = st.session_state._warmup
+    return warmup is None or warmup.is_alive()
+
+
+def _warmup_failed() -> bool:
+    return "error" in st.session_state.get("_warmup_outcome", {})
+
+
+# Load models while the user is still reading the page; the chat panel then only joins.
+if "_warmup" not in st.session_state:
+    _start_warmup()
+
+
+EVIDENCE_PREVIEW_CHARS = 200
+
+
+def _evidence_html(docs, full_text_count: int = 1) -> str:
+    """
+    Build all evidence blocks as one HTML string so they go out in a single delta.
+    Only the first `full_text_count` blocks carry their full chunk text; the rest
+    send a short preview until the user asks for them.
+    """
+    parts = []
+    for i, doc in enumerate(docs, 1):
+        metadata = doc.get("metadata", {})
+        source = html.escape(str(metadata.get("source", "Unknown")))
+        page = html.escape(str(metadata.get("page", "N/A")))
+        text = doc.get("page_content", "No content")
+        if i > full_text_count and len(text) > EVIDENCE_PREVIEW_CHARS:
+            text = text[:EVIDENCE_PREVIEW_CHARS].rstrip() + " ..."
+        # A blank line would end the HTML block under CommonMark and spill the rest of
+        # the chunk out as markdown, so line breaks go in as character references.
+        content = "&#10;".join(html.escape(text).splitlines())
+        open_attr = " open" if i == 1 else ""
+        parts.append(
+            f"<details{open_attr}><summary>{i}. {source} (Page {page})</summary>"
+            f"<pre style=\"white-space: pre-wrap\">{content}</pre></details>"
+        )
+    return "\n".join(parts)
+
+
+def _upload_hash(uploaded_file) -> str:
+    # getbuffer() is a view over the upload already in memory, so hashing copies nothing.
+    return hashlib.blake2b(uploaded_file.getbuffer(), digest_size=16).hexdigest()
+
+
+def _spill_upload(uploaded_file, tmp_path: str) -> str:
+    """
+    Write one uploaded PDF to `tmp_path` and return the path.
+    """
+    with open(tmp_path, "wb", buffering=1024 * 1024) as tmp_file:
+        # Stream in 1 MiB blocks instead of materializing the whole PDF as bytes.
+        uploaded_file.seek(0)
+        shutil.copyfileobj(uploaded_file, tmp_file, length=1024 * 1024)
+    return tmp_path
 
 
 def initialize_system() -> bool:
     try:
         with st.spinner("Starting engine..."):
-            st.session_state.rag_generator = get_generator()
+            if st.session_state._warmup is not None:
+                st.session_state._warmup.join()
+            st.session_state.rag_generator = _cached_generator()
+            _load_backend()
+            get_query_cache().load()
             return True
     except Exception as e:
         st.error(f"Engine error: {e}")
         return False
 
 
-st.title("Document Based Q&A")
-
-left, right = st.columns([1.8, 1], gap="large")
-
-with left:
+@st.fragment
+def _chat_panel() -> None:
+    # A fragment, so interactions here rerun only this panel, not the upload panel.
     st.subheader("Chat & Query")
 
-    if st.session_state.rag_generator is None:
-        if st.button("Start Engine", type="primary", use_container_width=True):
-            initialize_system()
-    else:
-        st.caption("Engine ready")
-
+    engine_status = st.empty()
     use_latest_only = st.checkbox("Use latest uploaded files only", value=True)
 
-    with st.form("qa_form"):
+    with st.form("qa_form", clear_on_submit=False):
         question = st.text_input("Question", placeholder="Ask from your document...")
         ask = st.form_submit_button("Get Answer", type="primary", use_container_width=True)
 
+    # No start button: pick up the warmed-up engine once it's loaded, or wait for it on submit.
+    # A failed warm-up is only retried on submit, not on every rerun of this panel.
+    if st.session_state.rag_generator is None and (ask or not (_warmup_pending() or _warmup_failed())):
+        initialize_system()
+    if st.session_state.rag_generator:
+        engine_status.caption("Engine ready")
+    elif _warmup_failed():
+        engine_status.caption("Engine failed to load; submitting a question retries")
+    else:
+        engine_status.caption("Engine warming up..." if RAG_WARMUP else "Engine loads on the first question")
+
+    answer_streamed = False
     if ask:
         if not st.session_state.rag_generator:
-            st.warning("Start the engine first.")
+            st.warning("The engine is not available.")
         elif not question or not question.strip():
             st.warning("Enter a question.")
         else:
@@ -62,66 +216,151 @@ with left:
             if use_latest_only:
                 source_filter = st.session_state.latest_ingested_sources or None
             try:
-                with st.spinner("Generating answer..."):
-                    result = st.session_state.rag_generator.answer_question(
-                        question.strip(), source_filter=source_filter
-                    )
-                answer = result.get("answer", "No answer generated.")
-                docs = result.get("source_documents", [])
-                st.markdown("**Answer**")
-                st.write(answer)
-
-                if docs:
-                    st.markdown("**Evidence**")
-                    for i, doc in enumerate(docs, 1):
-                        metadata = doc.get("metadata", {})
-                        source = metadata.get("source", "Unknown")
-                        page = metadata.get("page", "N/A")
-                        with st.expander(f"{i}. {source} (Page {page})", expanded=(i == 1)):
-                            st.text(doc.get("page_content", "No content"))
+                _load_backend()
+                question = question.strip()
+                qa_key = (normalize_question(question), tuple(source_filter or ()))
+                last_qa = st.session_state.get("_last_qa")
+                if (
+                    last_qa
+                    and last_qa[0] == qa_key
+                    and time.monotonic() - last_qa[1] < RESUBMIT_WINDOW_SECONDS
+                ):
+                    result = last_qa[2]
+                else:
+                    # The generator answers repeat questions from its semantic query cache.
+                    with st.spinner("Searching documents..."):
+                        streamed = st.session_state.rag_generator.answer_question_stream(
+                            question, source_filter=source_filter
+                        )
+                    # Paint tokens as they arrive; first-token latency is what the user feels.
+                    st.markdown("**Answer**")
+                    answer = st.write_stream(streamed["answer_stream"])
+                    answer_streamed = True
+                    result = {
+                        "answer": answer,
+                        "source_documents": streamed["source_documents"],
+                    }
+                    st.session_state._last_qa = (qa_key, time.monotonic(), result)
             except Exception as e:
+                st.session_state.pop("_last_qa", None)
                 st.error(f"Query failed: {e}")
 
-with right:
+    # Rendered from session state so the answer survives reruns (e.g. loading references).
+    last_qa = st.session_state.get("_last_qa")
+    if last_qa:
+        qa_key, _, result = last_qa
+        answer = result.get("answer", "No answer generated.")
+        docs = result.get("source_documents", [])
+        if not answer_streamed:
+            st.markdown("**Answer**")
+            st.write(answer)
+
+        if docs:
+            st.markdown("**Evidence**")
+            load_all = len(docs) > 1 and st.toggle(
+                "Load full text for all references",
+                key=f"load_refs_{hash(qa_key) & 0xFFFFFFFF:x}",
+            )
+            st.markdown(
+                _evidence_html(docs, full_text_count=len(docs) if load_all else 1),
+                unsafe_allow_html=True,
+            )
+
+
+@st.fragment
+def _upload_panel() -> None:
+    # A fragment, so picking files or toggling options doesn't re-render the chat panel.
     st.subheader("Upload")
+    for level, message in st.session_state.pop("_ingest_notices", []):
+        getattr(st, level)(message)
     uploaded_files = st.file_uploader("PDF files", type=["pdf"], accept_multiple_files=True)
     replace_existing = st.toggle("Replace old index", value=True)
+    embedding_batch_size = st.number_input("Embedding batch size", min_value=1, max_value=256, value=64)
 
     if st.button("Ingest Files", type="primary", use_container_width=True):
         if not uploaded_files:
             st.warning("Select at least one PDF.")
         else:
-            tmp_paths = []
-            source_names = []
+            notices = []
+            upload_dir = tempfile.TemporaryDirectory(prefix="rag_up_")
             try:
+                _load_backend()
                 if replace_existing:
                     deleted = clear_vectorstore()
-                    st.caption(f"Cleared {deleted} existing chunks.")
+                    notices.append(("caption", f"Cleared {deleted} existing chunks."))
+
+                # Skip PDFs whose exact bytes are already indexed (and duplicates in this batch).
+                digests = [_upload_hash(uploaded_file) for uploaded_file in uploaded_files]
+                seen = {} if replace_existing else find_indexed_sources(digests)
+                already_indexed = []
+                new_uploads = {}
+                for digest, uploaded_file in zip(digests, uploaded_files):
+                    if digest in seen:
+                        already_indexed.append(seen[digest])
+                    else:
+                        new_uploads.setdefault(digest, uploaded_file)
+                if already_indexed:
+                    notices.append(("caption", f"Skipped {len(already_indexed)} already indexed file(s)."))
+
+                ingested = []
+                failed = []
+                if new_uploads:
+                    files_to_ingest = list(new_uploads.values())
+                    # Temp-file writes are I/O-bound, so spill all uploads concurrently.
+                    with ThreadPoolExecutor(max_workers=min(8, len(files_to_ingest))) as executor:
+                        tmp_paths = list(
+                            executor.map(
+                                _spill_upload,
+                                files_to_ingest,
+                                [os.path.join(upload_dir.name, f"{i}.pdf") for i in range(len(files_to_ingest))],
+                            )
+                        )
+                    source_names = [uploaded_file.name for uploaded_file in files_to_ingest]
 
-                for uploaded_file in uploaded_files:
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-                        tmp_file.write(uploaded_file.getvalue())
-                        tmp_paths.append(tmp_file.name)
-                        source_names.append(uploaded_file.name)
+                    with st.spinner("Indexing files..."):
+                        result = ingest_documents(
+                            tmp_paths,
+                            source_names=source_names,
+                            embedding_batch_size=int(embedding_batch_size),
+                            content_hashes=list(new_uploads),
+                        )
 
-                with st.spinner("Indexing files..."):
-                    result = ingest_documents(tmp_paths, source_names=source_names)
+                    ingested = result.get("ingested", [])
+                    failed = result.get("failed", [])
 
-                ingested = result.get("ingested", [])
-                failed = result.get("failed", [])
-                st.session_state.latest_ingested_sources = [r["source"] for r in ingested]
-                reset_generator()
-                st.session_state.rag_generator = None
+                st.session_state.latest_ingested_sources = already_indexed + [r["source"] for r in ingested]
+                _save_state("latest_ingested_sources", st.session_state.latest_ingested_sources)
+                st.session_state.pop("_last_qa", None)
+                if ingested or replace_existing:
+                    get_query_cache().clear()
+                    _cached_generator.clear()
+                    reset_generator()
+                    st.session_state.rag_generator = None
+                    _start_warmup()
 
                 if ingested:
-                    st.success(f"Ingested {len(ingested)} file(s). Start engine to query.")
+                    notices.append(("success", f"Ingested {len(ingested)} file(s)."))
                 if failed:
-                    st.warning(f"{len(failed)} file(s) failed.")
+                    notices.append(("warning", f"{len(failed)} file(s) failed."))
                     for row in failed:
-                        st.caption(f"{row['source']}: {row['error']}")
+                        notices.append(("caption", f"{row['source']}: {row['error']}"))
             except Exception as e:
-                st.error(f"Ingestion failed: {e}")
+                notices.append(("error", f"Ingestion failed: {e}"))
             finally:
-                for tmp_path in tmp_paths:
-                    if os.path.exists(tmp_path):
-                        os.unlink(tmp_path)
+                # One rmtree off the request path instead of a stat + unlink per file.
+                threading.Thread(target=upload_dir.cleanup, daemon=True).start()
+
+            # The index and engine changed under the chat panel, so rerun the whole app once.
+            st.session_state._ingest_notices = notices
+            st.rerun()
+
+
+st.title("Document Based Q&A")
+
+left, right = st.columns([1.8, 1], gap="large")
+
+with left:
+    _chat_panel()
+
+with right:
+    _upload_panel()
@@ -9,22 +9,31 @@ Usage:
 from __future__ import annotations
 
 import argparse
-import os
-import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from typing import List
 
+from chromadb import PersistentClient
+from chromadb.api.shared_system_client import SharedSystemClient
 from huggingface_hub import InferenceClient
 
 from src.config import (
     CHROMA_PERSIST_DIRECTORY,
     HUGGINGFACE_API_KEY,
     HUGGINGFACE_MODEL,
+    LLM_BASE_URL,
 )
 from src.vectorstore import repair_chroma_directory
 
 
+# One client per process so repeated checks reuse its HTTP connection pool.
+if LLM_BASE_URL:
+    _HF_CLIENT = InferenceClient(base_url=LLM_BASE_URL, api_key=HUGGINGFACE_API_KEY or None)
+else:
+    _HF_CLIENT = InferenceClient(api_key=HUGGINGFACE_API_KEY) if HUGGINGFACE_API_KEY else None
+
+
 @dataclass
 class CheckResult:
     name: str
@@ -33,7 +42,7 @@ class CheckResult:
 
 
 def check_env() -> CheckResult:
-    if not HUGGINGFACE_API_KEY:
+    if not HUGGINGFACE_API_KEY and not LLM_BASE_URL:
         return CheckResult(
             name="Environment",
             ok=False,
@@ -46,45 +55,44 @@ def check_env() -> CheckResult:
     )
 
 
+def _release_chroma(client) -> None:
+    """
+    Close the probe's sqlite handles so the directory can be moved aside (Windows
+    refuses to move files this process still has open).
+    """
+    try:
+        if client is not None:
+            client._system.stop()
+    except BaseException as exc:
+        print(f"[ChromaDB] Could not stop client: {exc}")
+    finally:
+        SharedSystemClient.clear_system_cache()
+
+
 def check_chroma() -> CheckResult:
+    client = None
     try:
-        probe = (
-            "from chromadb import PersistentClient; "
-            f"c=PersistentClient(path={CHROMA_PERSIST_DIRECTORY!r}); "
-            "print(len(c.list_collections()))"
-        )
-        env = os.environ.copy()
-        env["PYTHONUTF8"] = "1"
-        completed = subprocess.run(
-            [sys.executable, "-c", probe],
-            capture_output=True,
-            text=True,
-            env=env,
-        )
-        if completed.returncode != 0:
-            raw_detail = completed.stderr.strip() or completed.stdout.strip() or "Unknown error."
-            detail = raw_detail.splitlines()[0]
-            return CheckResult(
-                name="ChromaDB",
-                ok=False,
-                detail=f"Failed to open ChromaDB: {detail}",
-            )
-        collections_count = completed.stdout.strip() or "0"
-        return CheckResult(
-            name="ChromaDB",
-            ok=True,
-            detail=f"Connected to {CHROMA_PERSIST_DIRECTORY}. Collections: {collections_count}.",
-        )
+        client = PersistentClient(path=CHROMA_PERSIST_DIRECTORY)
+        collections_count = len(client.list_collections())
     except BaseException as exc:
+        # BaseException: Rust-side corruption surfaces as pyo3 PanicException.
+        detail = (str(exc).strip() or type(exc).__name__).splitlines()[0]
         return CheckResult(
             name="ChromaDB",
             ok=False,
-            detail=f"Failed to open ChromaDB: {exc}",
+            detail=f"Failed to open ChromaDB: {detail}",
         )
+    finally:
+        _release_chroma(client)
+    return CheckResult(
+        name="ChromaDB",
+        ok=True,
+        detail=f"Connected to {CHROMA_PERSIST_DIRECTORY}. Collections: {collections_count}.",
+    )
 
 
 def check_huggingface_model_access() -> CheckResult:
-    if not HUGGINGFACE_API_KEY:
+    if _HF_CLIENT is None:
         return CheckResult(
             name="Hugging Face Model Access",
             ok=False,
@@ -92,15 +100,14 @@ def check_huggingface_model_access() -> CheckResult:
         )
 
     try:
-        client = InferenceClient(api_key=HUGGINGFACE_API_KEY)
-        response = client.chat_completion(
+        # Liveness only: a single generated token proves the model is reachable.
+        response = _HF_CLIENT.chat_completion(
             model=HUGGINGFACE_MODEL,
             messages=[{"role": "user", "content": "Reply with OK"}],
-            max_tokens=8,
+            max_tokens=1,
             temperature=0.0,
         )
-        text = response.choices[0].message.content if response and response.choices else ""
-        if not text:
+        if not response or not response.choices:
             raise RuntimeError("Empty response from model.")
         return CheckResult(
             name="Hugging Face Model Access",
@@ -116,19 +123,33 @@ def check_huggingface_model_access() -> CheckResult:
 
 
 def run_checks(skip_llm: bool, repair_chroma: bool) -> List[CheckResult]:
-    chroma_result = check_chroma()
-    results = [check_env()]
+    # The probes are independent, so run them concurrently; results keep this order.
+    checks = [check_env, check_chroma]
+    if not skip_llm:
+        checks.append(check_huggingface_model_access)
+    with ThreadPoolExecutor(max_workers=len(checks)) as executor:
+        futures = [executor.submit(check) for check in checks]
+        results = [future.result() for future in futures]
+
+    chroma_result = results[1]
     if repair_chroma and not chroma_result.ok:
-        backup_dir = repair_chroma_directory()
-        chroma_result = CheckResult(
-            name="ChromaDB",
-            ok=False,
-            detail=(
-                f"{chroma_result.detail} Auto-repair moved old DB to {backup_dir}. "
-                "Re-run health check now."
-            ),
-        )
-    results.append(chroma_result)
+        try:
+            backup_dir = repair_chroma_directory()
+        except Exception as exc:
+            results[1] = CheckResult(
+                name="ChromaDB",
+                ok=False,
+                detail=f"{chroma_result.detail} Auto-repair failed: {exc}",
+            )
+        else:
+            results[1] = CheckResult(
+                name="ChromaDB",
+                ok=False,
+                detail=(
+                    f"{chroma_result.detail} Auto-repair moved old DB to {backup_dir}. "
+                    "Re-run health check now."
+                ),
+            )
     if skip_llm:
         results.append(
             CheckResult(
@@ -137,8 +158,6 @@ def run_checks(skip_llm: bool, repair_chroma: bool) -> List[CheckResult]:
                 detail="Skipped by --skip-llm flag.",
             )
         )
-    else:
-        results.append(check_huggingface_model_access())
     return results
 
 
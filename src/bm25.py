@@ -0,0 +1,172 @@
+"""
+BM25 keyword retriever backed by a precomputed sparse term-weight matrix.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+from scipy.sparse import csr_matrix
+
+_TOKEN = re.compile(r"\w+")
+_ARRAYS = ("indptr", "indices", "data")  # CSR components, one .npy file each
+_VOCABULARY_FILE = "vocabulary.json"
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+def _pack(values: Iterable[bytes]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Concatenate byte strings into one uint8 array plus (n + 1) start offsets.
+    """
+    values = list(values)
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in values], out=offsets[1:])
+    return np.frombuffer(b"".join(values), dtype=np.uint8), offsets
+
+
+class StoredDocuments(Sequence):
+    """
+    Read-only document list backed by packed UTF-8 text and JSON metadata arrays
+    (typically memory-mapped); a Document is only built when it is accessed.
+    """
+    def __init__(self, text, text_offsets, metadata, metadata_offsets):
+        self._text, self._text_offsets = text, text_offsets
+        self._metadata, self._metadata_offsets = metadata, metadata_offsets
+
+    def __len__(self) -> int:
+        return len(self._text_offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        text = self._text[self._text_offsets[index]:self._text_offsets[index + 1]]
+        metadata = self._metadata[self._metadata_offsets[index]:self._metadata_offsets[index + 1]]
+        return Document(page_content=text.tobytes().decode("utf-8"), metadata=json.loads(metadata.tobytes()))
+
+
+class NumpyBM25Retriever(BaseRetriever):
+    """
+    Okapi BM25 with the per-(document, term) weights computed once at build time,
+    so scoring a query, or a batch of queries, is a single sparse matrix product.
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    docs: Any  # Sequence[Document]: a list, or StoredDocuments after load()
+    vocabulary: Dict[str, int]
+    weights: Any  # csr_matrix (n_docs, n_terms)
+    k: int = 4
+
+    @classmethod
+    def from_documents(
+        cls, documents: Sequence[Document], k1: float = 1.5, b: float = 0.75, **kwargs: Any
+    ) -> "NumpyBM25Retriever":
+        vocabulary: Dict[str, int] = {}
+        term_ids: List[int] = []
+        lengths = np.zeros(len(documents), dtype=np.int64)
+        for row, doc in enumerate(documents):
+            tokens = tokenize(doc.page_content)
+            lengths[row] = len(tokens)
+            term_ids.extend([vocabulary.setdefault(term, len(vocabulary)) for term in tokens])
+
+        # Count (document, term) occurrences in one pass over flat arrays.
+        n_terms = max(len(vocabulary), 1)
+        doc_ids = np.repeat(np.arange(len(documents), dtype=np.int64), lengths)
+        keys, counts = np.unique(doc_ids * n_terms + np.asarray(term_ids, dtype=np.int64), return_counts=True)
+        rows, cols = np.divmod(keys, n_terms)
+        tf = counts.astype(np.float32)
+        lengths = lengths.astype(np.float32)
+        n_docs = len(documents)
+        doc_freq = np.bincount(cols, minlength=len(vocabulary)).astype(np.float32)
+        # Lucene-style idf: always positive, even for terms in most documents.
+        idf = np.log((n_docs - doc_freq + 0.5) / (doc_freq + 0.5) + 1.0)
+        avg_length = float(lengths.mean()) if n_docs else 0.0
+        norm = k1 * (1.0 - b + b * lengths / (avg_length or 1.0))
+        data = idf[cols] * tf * (k1 + 1.0) / (tf + norm[rows])
+        weights = csr_matrix((data, (rows, cols)), shape=(n_docs, len(vocabulary)), dtype=np.float32)
+        return cls(docs=list(documents), vocabulary=vocabulary, weights=weights, **kwargs)
+
+    def save(self, directory: str) -> None:
+        """
+        Write the index to `directory` as flat .npy arrays: the CSR weights, and the
+        documents' UTF-8 text and JSON metadata packed with offsets.
+        """
+        os.makedirs(directory, exist_ok=True)
+        weights = self.weights.tocsr()
+        arrays = {name: getattr(weights, name) for name in _ARRAYS}
+        arrays["text"], arrays["text_offsets"] = _pack(doc.page_content.encode("utf-8") for doc in self.docs)
+        arrays["metadata"], arrays["metadata_offsets"] = _pack(
+            json.dumps(doc.metadata or {}).encode("utf-8") for doc in self.docs
+        )
+        for name, array in arrays.items():
+            np.save(os.path.join(directory, f"{name}.npy"), array)
+        with open(os.path.join(directory, _VOCABULARY_FILE), "w", encoding="utf-8") as f:
+            json.dump(self.vocabulary, f)
+
+    @classmethod
+    def load(cls, directory: str, **kwargs: Any) -> "NumpyBM25Retriever":
+        """
+        Open an index written by save(). Every array is memory-mapped read-only, so
+        loading doesn't read the corpus and processes opening the same files share
+        their pages; only the vocabulary is parsed.
+        """
+        def _open(name: str) -> np.ndarray:
+            return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+
+        with open(os.path.join(directory, _VOCABULARY_FILE), encoding="utf-8") as f:
+            vocabulary = json.load(f)
+        docs = StoredDocuments(_open("text"), _open("text_offsets"), _open("metadata"), _open("metadata_offsets"))
+        weights = csr_matrix(
+            (_open("data"), _open("indices"), _open("indptr")), shape=(len(docs), len(vocabulary)), copy=False
+        )
+        return cls(docs=docs, vocabulary=vocabulary, weights=weights, **kwargs)
+
+    def _query_matrix(self, queries: Sequence[str]) -> csr_matrix:
+        rows, cols = [], []
+        for row, query in enumerate(queries):
+            for term in tokenize(query):
+                col = self.vocabulary.get(term)
+                if col is not None:
+                    rows.append(row)
+                    cols.append(col)
+        data = np.ones(len(rows), dtype=np.float32)  # Repeated query terms add up
+        return csr_matrix((data, (rows, cols)), shape=(len(queries), len(self.vocabulary)), dtype=np.float32)
+
+    def score_batch(self, queries: Sequence[str]) -> np.ndarray:
+        """
+        BM25 scores as a dense (n_docs, n_queries) array.
+        """
+        return np.asarray((self.weights @ self._query_matrix(queries).T).todense())
+
+    def _top_k(self, scores: np.ndarray) -> List[Document]:
+        k = min(self.k, int(np.count_nonzero(scores)))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        return [self.docs[i] for i in top[np.argsort(-scores[top], kind="stable")]]
+
+    def batch_invoke(self, queries: Sequence[str]) -> List[List[Document]]:
+        """
+        Top-k documents for every query, scored together in one matrix product.
+        """
+        scores = self.score_batch(queries)
+        return [self._top_k(scores[:, column]) for column in range(len(queries))]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self._top_k(self.score_batch([query])[:, 0])
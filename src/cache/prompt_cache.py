@@ -0,0 +1,102 @@
+"""
+Persistent cache of LLM completions keyed by the exact prompt.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from src.config import (
+    HUGGINGFACE_MODEL,
+    PROMPT_CACHE_MAX_SIZE,
+    PROMPT_CACHE_PATH,
+    PROMPT_CACHE_TTL,
+)
+
+
+def prompt_key(prompt: str, model: str = HUGGINGFACE_MODEL) -> str:
+    """
+    Cache key for a prompt; includes the model so switching models never serves stale text.
+    """
+    return hashlib.sha256(f"{model}\x1f{prompt}".encode("utf-8")).hexdigest()
+
+
+class PromptCache:
+    """
+    SQLite-backed completion cache. Entries expire after `ttl_seconds`; once more than
+    `max_size` entries exist, the least recently used ones are evicted.
+    """
+    def __init__(
+        self,
+        path: str = PROMPT_CACHE_PATH,
+        max_size: int = PROMPT_CACHE_MAX_SIZE,
+        ttl_seconds: float = PROMPT_CACHE_TTL,
+    ):
+        self.path = path
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            "key TEXT PRIMARY KEY, completion TEXT NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+
+    def get(self, prompt: str) -> Optional[str]:
+        key = prompt_key(prompt)
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT completion, created FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE completions SET last_used = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, prompt: str, completion: str) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions (key, completion, created, last_used) VALUES (?, ?, ?, ?)",
+                (prompt_key(prompt), completion, now, now),
+            )
+            self._conn.execute("DELETE FROM completions WHERE ? - created > ?", (now, self.ttl_seconds))
+            self._conn.execute(
+                "DELETE FROM completions WHERE key NOT IN "
+                "(SELECT key FROM completions ORDER BY last_used DESC LIMIT ?)",
+                (self.max_size,),
+            )
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM completions")
+
+
+# Global instance
+_prompt_cache_instance = None
+
+def get_prompt_cache():
+    global _prompt_cache_instance
+    if _prompt_cache_instance is None:
+        _prompt_cache_instance = PromptCache()
+    return _prompt_cache_instance
+
+
+def reset_prompt_cache():
+    global _prompt_cache_instance
+    _prompt_cache_instance = None
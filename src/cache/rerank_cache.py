@@ -0,0 +1,129 @@
+"""
+Persistent cache of cross-encoder scores keyed by (query, chunk text).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Sequence
+
+from src.config import (
+    RERANK_CACHE_MAX_SIZE,
+    RERANK_CACHE_PATH,
+    RERANK_CACHE_TTL,
+    RERANKER_MODEL,
+)
+
+
+# Rows allowed above max_size before an eviction pass, so eviction doesn't run on every write.
+_EVICT_SLACK = 0.1
+
+
+def _digest(text: str) -> bytes:
+    return hashlib.sha1(text.encode("utf-8")).digest()
+
+
+class RerankScoreCache:
+    """
+    SQLite-backed (query, document) score cache. The query hash includes the reranker
+    model, so switching models never serves stale scores. Entries expire after
+    `ttl_seconds`; once the table grows past `max_size` plus some slack, the oldest
+    rows are evicted back down to `max_size`.
+    """
+    def __init__(
+        self,
+        path: str = RERANK_CACHE_PATH,
+        max_size: int = RERANK_CACHE_MAX_SIZE,
+        ttl_seconds: float = RERANK_CACHE_TTL,
+        model: str = RERANKER_MODEL,
+    ):
+        self.path = path
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.model = model
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS scores ("
+            "query_hash BLOB NOT NULL, doc_hash BLOB NOT NULL, score REAL NOT NULL, created REAL NOT NULL, "
+            "PRIMARY KEY (query_hash, doc_hash))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS scores_created ON scores (created)")
+        self._rows = self._conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+
+    def _query_hash(self, query: str) -> bytes:
+        return _digest(f"{self.model}\x1f{query}")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+
+    def get_many(self, query: str, texts: Sequence[str]) -> List[Optional[float]]:
+        """
+        Cached score per text, in order; None where the pair is unknown or expired.
+        """
+        if not texts:
+            return []
+        doc_hashes = [_digest(text) for text in texts]
+        placeholders = ",".join("?" * len(set(doc_hashes)))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT doc_hash, score FROM scores WHERE query_hash = ? AND created >= ? "
+                f"AND doc_hash IN ({placeholders})",
+                (self._query_hash(query), time.time() - self.ttl_seconds, *set(doc_hashes)),
+            ).fetchall()
+        found = dict(rows)
+        return [found.get(doc_hash) for doc_hash in doc_hashes]
+
+    def set_many(self, query: str, texts: Sequence[str], scores: Sequence[float]) -> None:
+        if not texts:
+            return
+        now = time.time()
+        query_hash = self._query_hash(query)
+        with self._lock, self._conn:
+            # Upper bound: replaced rows are counted too, and the next eviction recounts.
+            self._rows += self._conn.executemany(
+                "INSERT OR REPLACE INTO scores (query_hash, doc_hash, score, created) VALUES (?, ?, ?, ?)",
+                [(query_hash, _digest(text), float(score), now) for text, score in zip(texts, scores)],
+            ).rowcount
+            if self._rows > self.max_size * (1 + _EVICT_SLACK):
+                self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        # Both deletes walk the `created` index instead of sorting the table.
+        self._conn.execute("DELETE FROM scores WHERE created < ?", (now - self.ttl_seconds,))
+        rows = self._conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+        if rows > self.max_size:
+            self._conn.execute(
+                "DELETE FROM scores WHERE rowid IN (SELECT rowid FROM scores ORDER BY created LIMIT ?)",
+                (rows - self.max_size,),
+            )
+        self._rows = min(rows, self.max_size)
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM scores")
+            self._rows = 0
+
+
+# Global instance
+_rerank_cache_instance = None
+
+def get_rerank_cache():
+    global _rerank_cache_instance
+    if _rerank_cache_instance is None:
+        _rerank_cache_instance = RerankScoreCache()
+    return _rerank_cache_instance
+
+
+def reset_rerank_cache():
+    global _rerank_cache_instance
+    _rerank_cache_instance = None
@@ -0,0 +1,236 @@
+"""
+Semantic cache for answered questions, keyed by query embedding and source scope.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.config import (
+    QUERY_CACHE_MAX_SIZE,
+    QUERY_CACHE_PATH,
+    QUERY_CACHE_THRESHOLD,
+    QUERY_CACHE_TTL,
+)
+
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """
+    Cache key for a question: collapse whitespace, casefold, drop trailing ?!.
+    """
+    return _WHITESPACE_RE.sub(" ", question).strip().casefold().rstrip("?!. ")
+
+
+def source_filter_key(source_filter: Optional[List[str]]) -> str:
+    """
+    Order-insensitive key for a source filter; empty string means "all sources".
+    """
+    if not source_filter:
+        return ""
+    return "\x1f".join(sorted({s for s in source_filter if isinstance(s, str) and s.strip()}))
+
+
+class SemanticQueryCache:
+    """
+    Returns a previous answer when a new question embeds close enough to a cached one.
+
+    Embeddings live in a float32 matrix (unit-normalized rows) so a lookup is a
+    single matrix-vector product. Entries expire after `ttl_seconds` and the least
+    recently used entry is evicted once `max_size` is reached. With a `path`, every
+    entry is also a row in a SQLite file, so adding one writes one row rather than
+    rewriting the whole cache.
+    """
+    def __init__(
+        self,
+        path: Optional[str] = QUERY_CACHE_PATH,
+        max_size: int = QUERY_CACHE_MAX_SIZE,
+        ttl_seconds: float = QUERY_CACHE_TTL,
+        threshold: float = QUERY_CACHE_THRESHOLD,
+    ):
+        self.path = path
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._loaded = False
+        self._reset_state()
+
+    def _reset_state(self) -> None:
+        self._matrix = np.empty((0, 0), dtype=np.float32)
+        self._created = np.empty(0, dtype=np.float64)
+        self._last_used = np.empty(0, dtype=np.float64)
+        self._ids: List[int] = []
+        self._keys: List[str] = []
+        self._payloads: List[Dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        return len(self._payloads)
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vec = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm > 0 else vec
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "id INTEGER PRIMARY KEY, scope TEXT NOT NULL, embedding BLOB NOT NULL, payload TEXT NOT NULL, "
+            "created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        return conn
+
+    def load(self) -> None:
+        """
+        Lazy-load persisted entries once; a missing or unreadable file starts empty.
+        """
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            if not self.path:
+                return
+            try:
+                self._conn = self._connect()
+                rows = self._conn.execute(
+                    "SELECT id, scope, embedding, payload, created, last_used FROM entries ORDER BY id"
+                ).fetchall()
+                if rows:
+                    self._matrix = np.vstack([np.frombuffer(row[2], dtype=np.float32) for row in rows])
+                    self._created = np.array([row[4] for row in rows], dtype=np.float64)
+                    self._last_used = np.array([row[5] for row in rows], dtype=np.float64)
+                    self._ids = [row[0] for row in rows]
+                    self._keys = [row[1] for row in rows]
+                    self._payloads = [json.loads(row[3]) for row in rows]
+            except Exception as exc:
+                print(f"[Query Cache] Ignoring unreadable cache file {self.path}: {exc}")
+                self._reset_state()
+                return
+            self._drop_expired(time.time())
+
+    def _keep(self, mask: np.ndarray) -> None:
+        dropped = [i for i, keep in zip(self._ids, mask) if not keep]
+        self._matrix = self._matrix[mask]
+        self._created = self._created[mask]
+        self._last_used = self._last_used[mask]
+        self._ids = [i for i, keep in zip(self._ids, mask) if keep]
+        self._keys = [k for k, keep in zip(self._keys, mask) if keep]
+        self._payloads = [p for p, keep in zip(self._payloads, mask) if keep]
+        if dropped and self._conn is not None:
+            with self._conn:
+                self._conn.execute(f"DELETE FROM entries WHERE id IN ({','.join('?' * len(dropped))})", dropped)
+
+    def _drop_expired(self, now: float) -> None:
+        if len(self._payloads):
+            self._keep(now - self._created <= self.ttl_seconds)
+
+    def lookup(self, embedding, source_filter: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Return the cached result for the closest question in the same source scope,
+        or None when nothing clears the similarity threshold.
+        """
+        self.load()
+        key = source_filter_key(source_filter)
+        query = self._normalize(embedding)
+        now = time.time()
+
+        with self._lock:
+            self._drop_expired(now)
+            if not len(self._payloads) or self._matrix.shape[1] != query.shape[0]:
+                return None
+            scores = self._matrix @ query
+            scores[[k != key for k in self._keys]] = -1.0
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            self._last_used[best] = now
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute("UPDATE entries SET last_used = ? WHERE id = ?", (now, self._ids[best]))
+            return self._payloads[best]
+
+    def add(self, embedding, source_filter: Optional[List[str]], result: Dict[str, Any]) -> None:
+        """
+        Cache an answer and persist it as one new row.
+        """
+        self.load()
+        query = self._normalize(embedding)
+        now = time.time()
+        payload = {
+            "answer": result.get("answer", ""),
+            "source_documents": result.get("source_documents", []),
+        }
+        key = source_filter_key(source_filter)
+
+        with self._lock:
+            self._drop_expired(now)
+            if len(self._payloads) and self._matrix.shape[1] != query.shape[0]:
+                # Embedding model changed; old vectors are not comparable.
+                self._keep(np.zeros(len(self._payloads), dtype=bool))
+            if len(self._payloads) >= self.max_size:
+                lru = np.argsort(self._last_used)[: len(self._payloads) - self.max_size + 1]
+                mask = np.ones(len(self._payloads), dtype=bool)
+                mask[lru] = False
+                self._keep(mask)
+
+            entry_id = self._ids[-1] + 1 if self._ids else 0
+            if self._conn is not None:
+                with self._conn:
+                    entry_id = self._conn.execute(
+                        "INSERT INTO entries (scope, embedding, payload, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                        (key, query.tobytes(), json.dumps(payload), now, now),
+                    ).lastrowid
+
+            if len(self._payloads):
+                self._matrix = np.vstack([self._matrix, query[None, :]])
+            else:
+                self._matrix = query[None, :].copy()
+            self._created = np.append(self._created, now)
+            self._last_used = np.append(self._last_used, now)
+            self._ids.append(entry_id)
+            self._keys.append(key)
+            self._payloads.append(payload)
+
+    def clear(self) -> None:
+        """
+        Drop every entry, e.g. after the index changed underneath the cached answers.
+        """
+        with self._lock:
+            self._reset_state()
+            if self._conn is None and self.path and os.path.exists(self.path):
+                self._conn = self._connect()
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute("DELETE FROM entries")
+            self._loaded = True
+
+
+# Global instance
+_query_cache_instance = None
+
+def get_query_cache():
+    global _query_cache_instance
+    if _query_cache_instance is None:
+        _query_cache_instance = SemanticQueryCache()
+    return _query_cache_instance
+
+
+def reset_query_cache():
+    global _query_cache_instance
+    _query_cache_instance = None
@@ -1,29 +1,151 @@
 import os
+from dataclasses import dataclass
+
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Hugging Face Configuration
-HUGGINGFACE_API_KEY = os.getenv("HUGGINGFACE_API_KEY", "")
-HUGGINGFACE_MODEL = os.getenv("HUGGINGFACE_MODEL", "meta-llama/Meta-Llama-3-70B-Instruct")
+_ROOT_DIR = os.path.dirname(os.path.dirname(__file__))
+
+
+@dataclass(frozen=True, slots=True)
+class _Config:
+    """
+    Settings parsed from the environment once at import; frozen so nothing mutates them later.
+    """
+    # Hugging Face Configuration
+    HUGGINGFACE_API_KEY: str
+    HUGGINGFACE_MODEL: str
+    LLM_BASE_URL: str
+
+    # Embedding Model Configuration
+    EMBEDDING_MODEL: str
+    EMBEDDING_BATCH_SIZE: int
+    EMBEDDING_DEVICE: str
+    EMBEDDING_BACKEND: str
+    EMBEDDING_TORCH_COMPILE: bool
+
+    # ChromaDB Configuration
+    CHROMA_PERSIST_DIRECTORY: str
+
+    # Chunking Configuration
+    CHUNK_SIZE: int
+    CHUNK_OVERLAP: int
+
+    # Retrieval Configuration
+    TOP_K: int
+    RERANK_TOP_K: int
+    RERANK_CANDIDATES: int
+    RERANKER_MODEL: str
+    RERANKER_BACKEND: str
+
+    # Query Cache Configuration
+    QUERY_CACHE_PATH: str
+    QUERY_CACHE_MAX_SIZE: int
+    QUERY_CACHE_TTL: int
+    QUERY_CACHE_THRESHOLD: float
+
+    # Prompt Cache Configuration
+    PROMPT_CACHE_PATH: str
+    PROMPT_CACHE_MAX_SIZE: int
+    PROMPT_CACHE_TTL: int
+
+    # Rerank Score Cache Configuration
+    RERANK_CACHE_PATH: str
+    RERANK_CACHE_MAX_SIZE: int
+    RERANK_CACHE_TTL: int
+
+    # System Settings
+    RAG_WARMUP: bool
+    DATA_DIR: str
 
-# Embedding Model Configuration
-EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    def __post_init__(self):
+        for name in (
+            "EMBEDDING_BATCH_SIZE",
+            "CHUNK_SIZE",
+            "TOP_K",
+            "RERANK_TOP_K",
+            "QUERY_CACHE_MAX_SIZE",
+            "PROMPT_CACHE_MAX_SIZE",
+            "RERANK_CACHE_MAX_SIZE",
+        ):
+            if getattr(self, name) < 1:
+                raise ValueError(f"{name} must be a positive integer.")
+        if min(self.CHUNK_OVERLAP, self.QUERY_CACHE_TTL, self.PROMPT_CACHE_TTL, self.RERANK_CACHE_TTL) < 0:
+            raise ValueError("CHUNK_OVERLAP and cache TTLs must not be negative.")
+        if not -1.0 <= self.QUERY_CACHE_THRESHOLD <= 1.0:
+            raise ValueError("QUERY_CACHE_THRESHOLD must be a cosine similarity in [-1, 1].")
+        if self.RERANK_TOP_K > self.TOP_K:
+            raise ValueError("RERANK_TOP_K must not exceed TOP_K.")
+        if self.RERANK_TOP_K > self.RERANK_CANDIDATES:
+            raise ValueError("RERANK_TOP_K must not exceed RERANK_CANDIDATES.")
+        for name in ("EMBEDDING_BACKEND", "RERANKER_BACKEND"):
+            if getattr(self, name) not in ("torch", "onnx", "openvino"):
+                raise ValueError(f"{name} must be 'torch', 'onnx' or 'openvino'.")
 
-# ChromaDB Configuration
-CHROMA_PERSIST_DIRECTORY = os.getenv("CHROMA_PERSIST_DIRECTORY", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "chroma_db"))
 
-# Chunking Configuration
-CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "800")) # Increased for semantic chunking base
-CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "100"))
+CFG = _Config(
+    HUGGINGFACE_API_KEY=os.getenv("HUGGINGFACE_API_KEY", ""),
+    HUGGINGFACE_MODEL=os.getenv("HUGGINGFACE_MODEL", "meta-llama/Meta-Llama-3-70B-Instruct"),
+    LLM_BASE_URL=os.getenv("LLM_BASE_URL", "").rstrip("/"), # Self-hosted OpenAI-compatible server; empty uses the HF Inference API
+    EMBEDDING_MODEL=os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"),
+    EMBEDDING_BATCH_SIZE=int(os.getenv("EMBEDDING_BATCH_SIZE", "64")), # Texts per encode forward pass
+    EMBEDDING_DEVICE=os.getenv("EMBEDDING_DEVICE", "auto"), # auto, cpu, cuda, cuda:1, ...
+    EMBEDDING_BACKEND=os.getenv("EMBEDDING_BACKEND", "torch"), # torch, or onnx / openvino for int8-quantized CPU inference
+    EMBEDDING_TORCH_COMPILE=os.getenv("EMBEDDING_TORCH_COMPILE", "false").lower() in ("1", "true", "yes"), # torch.compile the encoder
+    CHROMA_PERSIST_DIRECTORY=os.getenv("CHROMA_PERSIST_DIRECTORY", os.path.join(_ROOT_DIR, "data", "chroma_db")),
+    CHUNK_SIZE=int(os.getenv("CHUNK_SIZE", "800")), # Max tokens per chunk (also capped at the embedding model's max sequence length)
+    CHUNK_OVERLAP=int(os.getenv("CHUNK_OVERLAP", "100")), # Tokens shared by consecutive re-split windows
+    TOP_K=int(os.getenv("TOP_K", "10")), # Fetch more for reranking
+    RERANK_TOP_K=int(os.getenv("RERANK_TOP_K", "3")), # Chunks kept after reranking; only these reach the prompt
+    RERANK_CANDIDATES=int(os.getenv("RERANK_CANDIDATES", "10")), # Best fused hybrid hits passed to the cross-encoder (of up to 2 * TOP_K)
+    RERANKER_MODEL=os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2"),
+    RERANKER_BACKEND=os.getenv("RERANKER_BACKEND", "torch"), # torch, or onnx / openvino for int8-quantized CPU inference
+    QUERY_CACHE_PATH=os.getenv("QUERY_CACHE_PATH", os.path.join(_ROOT_DIR, ".cache", "qcache.db")),
+    QUERY_CACHE_MAX_SIZE=int(os.getenv("QUERY_CACHE_MAX_SIZE", "2000")),
+    QUERY_CACHE_TTL=int(os.getenv("QUERY_CACHE_TTL", "600")), # Seconds
+    QUERY_CACHE_THRESHOLD=float(os.getenv("QUERY_CACHE_THRESHOLD", "0.92")), # Cosine similarity
+    PROMPT_CACHE_PATH=os.getenv("PROMPT_CACHE_PATH", os.path.join(_ROOT_DIR, ".cache", "prompt_cache.db")),
+    PROMPT_CACHE_MAX_SIZE=int(os.getenv("PROMPT_CACHE_MAX_SIZE", "1024")),
+    PROMPT_CACHE_TTL=int(os.getenv("PROMPT_CACHE_TTL", "86400")), # Seconds
+    RERANK_CACHE_PATH=os.getenv("RERANK_CACHE_PATH", os.path.join(_ROOT_DIR, ".cache", "rerank_cache.db")),
+    RERANK_CACHE_MAX_SIZE=int(os.getenv("RERANK_CACHE_MAX_SIZE", "50000")), # (query, chunk) pairs
+    RERANK_CACHE_TTL=int(os.getenv("RERANK_CACHE_TTL", "900")), # Seconds
+    RAG_WARMUP=os.getenv("RAG_WARMUP", "true").lower() in ("1", "true", "yes"), # Load models in the background at app start
+    DATA_DIR=os.path.join(_ROOT_DIR, "data"),
+)
 
-# Retrieval Configuration
-TOP_K = int(os.getenv("TOP_K", "10")) # Fetch more for reranking
-RERANK_TOP_K = int(os.getenv("RERANK_TOP_K", "3"))
+# Module-level aliases so `from src.config import X` keeps working.
+HUGGINGFACE_API_KEY = CFG.HUGGINGFACE_API_KEY
+HUGGINGFACE_MODEL = CFG.HUGGINGFACE_MODEL
+LLM_BASE_URL = CFG.LLM_BASE_URL
+EMBEDDING_MODEL = CFG.EMBEDDING_MODEL
+EMBEDDING_BATCH_SIZE = CFG.EMBEDDING_BATCH_SIZE
+EMBEDDING_DEVICE = CFG.EMBEDDING_DEVICE
+EMBEDDING_BACKEND = CFG.EMBEDDING_BACKEND
+EMBEDDING_TORCH_COMPILE = CFG.EMBEDDING_TORCH_COMPILE
+CHROMA_PERSIST_DIRECTORY = CFG.CHROMA_PERSIST_DIRECTORY
+CHUNK_SIZE = CFG.CHUNK_SIZE
+CHUNK_OVERLAP = CFG.CHUNK_OVERLAP
+TOP_K = CFG.TOP_K
+RERANK_TOP_K = CFG.RERANK_TOP_K
+RERANK_CANDIDATES = CFG.RERANK_CANDIDATES
+RERANKER_MODEL = CFG.RERANKER_MODEL
+RERANKER_BACKEND = CFG.RERANKER_BACKEND
+QUERY_CACHE_PATH = CFG.QUERY_CACHE_PATH
+QUERY_CACHE_MAX_SIZE = CFG.QUERY_CACHE_MAX_SIZE
+QUERY_CACHE_TTL = CFG.QUERY_CACHE_TTL
+QUERY_CACHE_THRESHOLD = CFG.QUERY_CACHE_THRESHOLD
+PROMPT_CACHE_PATH = CFG.PROMPT_CACHE_PATH
+PROMPT_CACHE_MAX_SIZE = CFG.PROMPT_CACHE_MAX_SIZE
+PROMPT_CACHE_TTL = CFG.PROMPT_CACHE_TTL
+RERANK_CACHE_PATH = CFG.RERANK_CACHE_PATH
+RERANK_CACHE_MAX_SIZE = CFG.RERANK_CACHE_MAX_SIZE
+RERANK_CACHE_TTL = CFG.RERANK_CACHE_TTL
+RAG_WARMUP = CFG.RAG_WARMUP
+DATA_DIR = CFG.DATA_DIR
 
-# System Settings
-DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
 os.makedirs(DATA_DIR, exist_ok=True)
 
-if not HUGGINGFACE_API_KEY:
+if not HUGGINGFACE_API_KEY and not LLM_BASE_URL:
     print("Warning: HUGGINGFACE_API_KEY not set. Generation will fail.")
@@ -0,0 +1,185 @@
+"""
+Process-wide embedding model shared by ingestion and retrieval.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Dict, Iterable, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_huggingface import HuggingFaceEmbeddings
+
+from src.config import (
+    EMBEDDING_BACKEND,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_DEVICE,
+    EMBEDDING_MODEL,
+    EMBEDDING_TORCH_COMPILE,
+)
+
+ONNX_QINT8_VNNI_FILE = "onnx/model_qint8_avx512_vnni.onnx"
+ONNX_QINT8_AVX512_FILE = "onnx/model_qint8_avx512.onnx"
+ONNX_QUINT8_AVX2_FILE = "onnx/model_quint8_avx2.onnx"
+ONNX_FP32_FILE = "onnx/model.onnx"
+# Best int8 export first; fp32 runs anywhere.
+_ONNX_FILES_BY_CPU_FLAG = (
+    ("avx512_vnni", ONNX_QINT8_VNNI_FILE),
+    ("avx512f", ONNX_QINT8_AVX512_FILE),
+    ("avx2", ONNX_QUINT8_AVX2_FILE),
+)
+OPENVINO_QINT8_FILE = "openvino/openvino_model_qint8_quantized.xml"
+
+
+def resolve_device(device: str = EMBEDDING_DEVICE) -> str:
+    """
+    Map "auto" to cuda when a GPU is visible, otherwise cpu.
+    """
+    if device != "auto":
+        return device
+    try:
+        import torch
+    except ImportError:
+        return "cpu"
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def _cpu_flags(cpuinfo_path: str = "/proc/cpuinfo") -> set:
+    try:
+        with open(cpuinfo_path, encoding="utf-8") as handle:
+            for line in handle:
+                if line.startswith("flags"):
+                    return set(line.split(":", 1)[-1].split())
+    except OSError:
+        pass
+    return set()
+
+
+def onnx_file_name(cpuinfo_path: str = "/proc/cpuinfo") -> str:
+    """
+    Pick the int8-quantized export built for the best instruction set this CPU has
+    (AVX-512 VNNI, AVX-512, AVX2); fall back to the fp32 export when none applies.
+    """
+    flags = _cpu_flags(cpuinfo_path)
+    return next((file for flag, file in _ONNX_FILES_BY_CPU_FLAG if flag in flags), ONNX_FP32_FILE)
+
+
+def _model_kwargs(device: str, backend: str = EMBEDDING_BACKEND) -> dict:
+    if backend == "onnx":
+        return {
+            "device": "cpu",
+            "backend": "onnx",
+            "model_kwargs": {"file_name": onnx_file_name(), "provider": "CPUExecutionProvider"},
+        }
+    if backend == "openvino":
+        # Statically quantized int8 IR; OpenVINO fuses the graph for Intel CPUs/iGPUs.
+        return {
+            "device": "cpu",
+            "backend": "openvino",
+            "model_kwargs": {"file_name": OPENVINO_QINT8_FILE},
+        }
+    # Fused scaled-dot-product attention (FlashAttention/memory-efficient kernels where available).
+    transformer_kwargs = {"attn_implementation": "sdpa"}
+    if device.startswith("cuda"):
+        # Half-precision weights: half the memory traffic and Tensor Core matmuls.
+        transformer_kwargs["torch_dtype"] = "float16"
+    return {"device": device, "model_kwargs": transformer_kwargs}
+
+
+def _compile_transformer(embeddings: HuggingFaceEmbeddings) -> None:
+    """
+    Compile the underlying transformer in place; batches vary in sequence length,
+    so shapes are traced as dynamic. A dummy batch triggers compilation here
+    rather than on the first real request.
+    """
+    transformer = embeddings._client[0].auto_model
+    transformer.compile(dynamic=True)
+    embeddings.embed_documents(["warmup", "warmup"])
+
+
+@lru_cache(maxsize=1)
+def get_embeddings() -> HuggingFaceEmbeddings:
+    """
+    Load the sentence-transformer once per process; later calls reuse the same weights.
+    """
+    model_kwargs = _model_kwargs(resolve_device())
+    print(
+        f"Initializing Embeddings: {EMBEDDING_MODEL} "
+        f"({model_kwargs.get('backend', 'torch')} on {model_kwargs['device']})"
+    )
+    embeddings = HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL,
+        model_kwargs=model_kwargs,
+        encode_kwargs={"batch_size": EMBEDDING_BATCH_SIZE, "normalize_embeddings": True},
+    )
+    if EMBEDDING_TORCH_COMPILE and EMBEDDING_BACKEND == "torch":
+        _compile_transformer(embeddings)
+    return embeddings
+
+
+def reset_embeddings():
+    """
+    Drop the cached model so the next get_embeddings() call loads it again.
+    """
+    get_embeddings.cache_clear()
+
+
+def with_batch_size(embeddings: HuggingFaceEmbeddings, batch_size: int) -> HuggingFaceEmbeddings:
+    """
+    Shallow copy that shares the loaded model but encodes `batch_size` texts per forward pass.
+    """
+    return embeddings.model_copy(
+        update={"encode_kwargs": {**embeddings.encode_kwargs, "batch_size": batch_size}}
+    )
+
+
+def encode_documents(embeddings, texts: List[str]) -> np.ndarray:
+    """
+    Embed `texts` into one contiguous float32 matrix of shape (len(texts), dim).
+
+    For HuggingFaceEmbeddings this calls the sentence-transformer directly, skipping
+    the `.tolist()` round trip through per-float Python objects; other embedding
+    objects go through `embed_documents`.
+    """
+    client = getattr(embeddings, "_client", None)
+    if client is None or getattr(embeddings, "multi_process", False):
+        return np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+
+    # Same preprocessing as HuggingFaceEmbeddings.embed_documents.
+    texts = [text.replace("\n", " ") for text in texts]
+    vectors = client.encode(texts, convert_to_numpy=True, **embeddings.encode_kwargs)
+    return np.ascontiguousarray(vectors, dtype=np.float32)
+
+
+class MemoEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that remembers document vectors by exact text.
+
+    `prime()` embeds many texts in one batched call up front, so a consumer that
+    embeds small groups (e.g. SemanticChunker, once per page) hits the memo
+    instead of running many small forward passes.
+    """
+    def __init__(self, base):
+        self.base = base
+        self._memo: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self._memo)
+
+    def prime(self, texts: Iterable[str]) -> None:
+        missing = [text for text in dict.fromkeys(texts) if text not in self._memo]
+        if not missing:
+            return
+        vectors = encode_documents(self.base, missing)
+        self._memo.update(zip(missing, vectors))
+
+    def embed_documents(self, texts: List[str]) -> List[np.ndarray]:
+        self.prime(texts)
+        return [self._memo[text] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.base.embed_query(text)
+
+    def clear(self) -> None:
+        self._memo.clear()
@@ -1,13 +1,32 @@
 
-from typing import Dict, Any, List, Optional
+from functools import lru_cache
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 from huggingface_hub import InferenceClient
 
 from src.config import (
     HUGGINGFACE_API_KEY,
-    HUGGINGFACE_MODEL
+    HUGGINGFACE_MODEL,
+    LLM_BASE_URL,
 )
+from src.cache.prompt_cache import get_prompt_cache
+from src.cache.semantic_cache import get_query_cache, normalize_question
 from src.retrieval import get_retriever, reset_retriever
 
+# Constant parts of the answer prompt, built once at import.
+_PROMPT_HEAD = """You are an intelligent assistant for finding information in documents.
+Use the following pieces of retrieved context to answer the question.
+
+Rules:
+1. If the answer is not in the context, strictly say "I don't know based on the provided documents."
+2. Do not hallucinate or use outside knowledge.
+3. Cite the source and page number if available (e.g., [Source: doc.pdf, Page: 5]).
+
+Context:
+"""
+_PROMPT_MID = "\n\nQuestion: "
+_PROMPT_TAIL = "\n\nAnswer:"
+_NO_ANSWER = "I couldn't generate an answer at the moment."
+
 class RAGGenerator:
     """
     Handles Answer Generation using LLM and Retrieved Context.
@@ -15,15 +34,42 @@ class RAGGenerator:
     def __init__(self):
         self.llm = self._initialize_llm()
         self.retriever = get_retriever()
+        self.query_cache = get_query_cache()
+        self.prompt_cache = get_prompt_cache()
+        # Per-instance so a reset generator doesn't keep the old models alive via the cache.
+        self._embed_question_cached = lru_cache(maxsize=512)(self._embed_question)
 
     def _initialize_llm(self):
+        if LLM_BASE_URL:
+            # Local server (TGI, vLLM, TensorRT-LLM, NIM); the token is optional there.
+            print(f"Initializing LLM: {HUGGINGFACE_MODEL} at {LLM_BASE_URL}")
+            return InferenceClient(base_url=LLM_BASE_URL, api_key=HUGGINGFACE_API_KEY or None)
+
         if not HUGGINGFACE_API_KEY:
             raise ValueError("HUGGINGFACE_API_KEY is required. Please set it in your .env file.")
         
         print(f"Initializing LLM: {HUGGINGFACE_MODEL}")
         return InferenceClient(api_key=HUGGINGFACE_API_KEY)
 
-    def _generate_text(self, prompt: str) -> str:
+    def _generate_text(self, prompt: str) -> Optional[str]:
+        """
+        Completion for `prompt`, from the prompt cache or the LLM; None when the LLM gave no usable text.
+        """
+        cached = self.prompt_cache.get(prompt) if self.prompt_cache is not None else None
+        if cached is not None:
+            return cached
+
+        text = self._call_llm(prompt)
+        if not text:
+            return None
+        if self.prompt_cache is not None:
+            self.prompt_cache.set(prompt, text)
+        return text
+
+    def _call_llm(self, prompt: str) -> Optional[str]:
+        """
+        One uncached completion; None when the model produced no usable text.
+        """
         if hasattr(self.llm, "chat_completion"):
             response = self.llm.chat_completion(
                 model=HUGGINGFACE_MODEL,
@@ -32,26 +78,110 @@ class RAGGenerator:
                 temperature=0.1,
             )
             text = response.choices[0].message.content if response and response.choices else ""
-            return text or "I couldn't generate an answer at the moment."
+            return text or None
 
         if hasattr(self.llm, "invoke"):
             response = self.llm.invoke(prompt)
             return response if isinstance(response, str) else str(response)
 
-        return "I couldn't generate an answer at the moment."
+        return None
 
-    def answer_question(self, question: str, source_filter: Optional[List[str]] = None) -> Dict[str, Any]:
+    def warm_up(self) -> None:
         """
-        Generate answer for a question.
+        Run the retriever's models once so the first user query starts hot.
         """
-        if not isinstance(question, str) or not question.strip():
-            return {
-                "answer": "Please enter a non-empty question.",
-                "source_documents": []
-            }
+        if hasattr(self.retriever, "warm_up"):
+            self.retriever.warm_up()
 
-        question = question.strip()
+    def _embed_question(self, question: str) -> Tuple[float, ...]:
+        return tuple(self.retriever.embeddings.embed_query(question))
 
+    def embed_question(self, question: str) -> Tuple[float, ...]:
+        """
+        Embed a question with the retriever's embedding model (used for cache lookups).
+        Repeated questions are served from an in-process LRU cache on the normalized text.
+        """
+        return self._embed_question_cached(normalize_question(question))
+
+    def _cache_lookup(
+        self, question: str, source_filter: Optional[List[str]]
+    ) -> Tuple[Optional[Tuple[float, ...]], Optional[Dict[str, Any]]]:
+        """
+        Returns (question embedding, cached result or None). The embedding is None
+        when caching is disabled or the question could not be embedded.
+        """
+        if self.query_cache is None:
+            return None, None
+        try:
+            embedding = self.embed_question(question)
+        except Exception as exc:
+            print(f"[Query Cache] Lookup skipped: {exc}")
+            return None, None
+        return embedding, self.query_cache.lookup(embedding, source_filter)
+
+    def _cache_store(
+        self, embedding: Optional[Tuple[float, ...]], source_filter: Optional[List[str]], result: Dict[str, Any]
+    ) -> None:
+        # Only answers grounded in retrieved context are worth replaying.
+        if embedding is not None and result["source_documents"]:
+            self.query_cache.add(embedding, source_filter, result)
+
+    def _stream_and_cache(
+        self,
+        stream: Iterator[str],
+        embedding: Optional[Tuple[float, ...]],
+        source_filter: Optional[List[str]],
+        source_docs: List[Dict[str, Any]],
+    ) -> Iterator[str]:
+        parts = []
+        for piece in stream:
+            parts.append(piece)
+            yield piece
+        if not parts:
+            # Failed generation: show the fallback, but never cache it as an answer.
+            yield _NO_ANSWER
+            return
+        # Reached only when the stream was consumed to the end.
+        self._cache_store(embedding, source_filter, {"answer": "".join(parts), "source_documents": source_docs})
+
+    def _stream_text(self, prompt: str) -> Iterator[str]:
+        """
+        Yield completion text as it arrives; yields nothing when the LLM gave no usable text.
+        """
+        if not hasattr(self.llm, "chat_completion"):
+            text = self._generate_text(prompt)
+            if text:
+                yield text
+            return
+
+        cached = self.prompt_cache.get(prompt) if self.prompt_cache is not None else None
+        if cached is not None:
+            yield cached
+            return
+
+        stream = self.llm.chat_completion(
+            model=HUGGINGFACE_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=512,
+            temperature=0.1,
+            stream=True,
+        )
+        parts = []
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                yield delta
+        if parts and self.prompt_cache is not None:
+            self.prompt_cache.set(prompt, "".join(parts))
+
+    def _prepare_prompt(
+        self, question: str, source_filter: Optional[List[str]] = None
+    ) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+        """
+        Retrieve context for a stripped question and build the LLM prompt.
+        Returns (None, []) when nothing relevant was retrieved.
+        """
         # 1. Retrieve
         try:
             retrieved_docs = self.retriever.get_relevant_documents(question, source_filter=source_filter)
@@ -59,7 +189,7 @@ class RAGGenerator:
             # Backward compatibility for older retriever mocks/implementations.
             retrieved_docs = self.retriever.get_relevant_documents(question)
 
-        context_str = ""
+        context_parts = []
         source_docs = []
 
         for i, doc in enumerate(retrieved_docs):
@@ -69,42 +199,89 @@ class RAGGenerator:
             source = metadata.get("source", "Unknown")
             page = metadata.get("page", "Unknown")
 
-            context_str += f"Document {i + 1} [Source: {source}, Page: {page}]:\n{content}\n\n"
+            context_parts.append(f"Document {i + 1} [Source: {source}, Page: {page}]:\n{content}\n\n")
             source_docs.append({
                 "page_content": content,
                 "metadata": metadata
             })
 
+        context_str = "".join(context_parts)
+        if not context_str.strip():
+            return None, []
+
         # 2. Generate
         # We use the LLM directly with the prompt
+        full_prompt = "".join((_PROMPT_HEAD, context_str, _PROMPT_MID, question, _PROMPT_TAIL))
+        return full_prompt, source_docs
 
-        full_prompt = f"""You are an intelligent assistant for finding information in documents.
-Use the following pieces of retrieved context to answer the question.
-
-Rules:
-1. If the answer is not in the context, strictly say "I don't know based on the provided documents."
-2. Do not hallucinate or use outside knowledge.
-3. Cite the source and page number if available (e.g., [Source: doc.pdf, Page: 5]).
+    def answer_question(self, question: str, source_filter: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Generate answer for a question.
+        Semantically equivalent questions in the same source scope are answered from the query cache.
+        """
+        if not isinstance(question, str) or not question.strip():
+            return {
+                "answer": "Please enter a non-empty question.",
+                "source_documents": []
+            }
 
-Context:
-{context_str}
+        embedding, cached = self._cache_lookup(question, source_filter)
+        if cached is not None:
+            return dict(cached)
 
-Question: {question}
-
-Answer:"""
-
-        if not context_str.strip():
+        full_prompt, source_docs = self._prepare_prompt(question.strip(), source_filter)
+        if full_prompt is None:
             return {
                 "answer": "I couldn't find relevant information in the indexed documents.",
                 "source_documents": []
             }
 
         answer_text = self._generate_text(full_prompt)
+        if answer_text is None:
+            return {
+                "answer": _NO_ANSWER,
+                "source_documents": source_docs
+            }
 
-        return {
+        result = {
             "answer": answer_text,
             "source_documents": source_docs
         }
+        self._cache_store(embedding, source_filter, result)
+        return result
+
+    def answer_question_stream(self, question: str, source_filter: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Like answer_question, but "answer_stream" yields answer text as the LLM produces it.
+        Retrieval runs before this returns, so "source_documents" is already populated.
+        A query cache hit is returned as a single-chunk stream.
+        """
+        if not isinstance(question, str) or not question.strip():
+            return {
+                "answer_stream": iter(["Please enter a non-empty question."]),
+                "source_documents": []
+            }
+
+        embedding, cached = self._cache_lookup(question, source_filter)
+        if cached is not None:
+            return {
+                "answer_stream": iter([cached.get("answer", "")]),
+                "source_documents": cached.get("source_documents", [])
+            }
+
+        full_prompt, source_docs = self._prepare_prompt(question.strip(), source_filter)
+        if full_prompt is None:
+            return {
+                "answer_stream": iter(["I couldn't find relevant information in the indexed documents."]),
+                "source_documents": []
+            }
+
+        return {
+            "answer_stream": self._stream_and_cache(
+                self._stream_text(full_prompt), embedding, source_filter, source_docs
+            ),
+            "source_documents": source_docs
+        }
 
 # Global instance
 _generator_instance = None
@@ -1,61 +1,238 @@
+import hashlib
 import os
-from typing import Dict, List, Optional
-
-import pdfplumber
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+import numpy as np
 from langchain_core.documents import Document
-from langchain_experimental.text_splitter import SemanticChunker
-from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_experimental.text_splitter import SemanticChunker, combine_sentences
+from langchain_text_splitters import RecursiveCharacterTextSplitter
 
+from src.embeddings import MemoEmbeddings, encode_documents, get_embeddings, with_batch_size
+from src.pdf_extract import PagePool, iter_page_texts, prefetch_files
 from src.vectorstore import get_chroma_vectorstore
 
+UPSERT_BATCH_SIZE = 100  # Records per Chroma upsert request
+PAGE_PREFETCH = 4  # Parsed pages buffered ahead of chunking/embedding
+CHUNKER_PAGE_GROUP = 8  # Pages whose sentence windows are embedded in one batched call
+
+T = TypeVar("T")
+
 try:
-    from src.config import EMBEDDING_MODEL, CHROMA_PERSIST_DIRECTORY
+    from src.config import CHROMA_PERSIST_DIRECTORY, CHUNK_OVERLAP, CHUNK_SIZE
 except ImportError:
     import sys
 
     sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    from src.config import EMBEDDING_MODEL, CHROMA_PERSIST_DIRECTORY
+    from src.config import CHROMA_PERSIST_DIRECTORY, CHUNK_OVERLAP, CHUNK_SIZE
 
 
-def load_pdf_with_metadata(file_path: str, source_name: Optional[str] = None) -> List[Document]:
+def _prefetch(items: Iterable[T], maxsize: int = PAGE_PREFETCH) -> Iterator[T]:
     """
-    Load PDF with page numbers and filename metadata.
+    Iterate `items` on a background thread, keeping up to `maxsize` results buffered.
+    Exceptions from the producer are re-raised in the consumer; closing the consumer
+    early stops the producer.
+    """
+    buffer: "queue.Queue[Tuple[bool, object]]" = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def _put(entry) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce() -> None:
+        try:
+            for item in items:
+                if not _put((False, item)):
+                    return
+        except BaseException as exc:
+            _put((True, exc))
+            return
+        _put((True, None))
+
+    threading.Thread(target=_produce, daemon=True).start()
+    try:
+        while True:
+            done, value = buffer.get()
+            if done:
+                if value is not None:
+                    raise value
+                return
+            yield value
+    finally:
+        stop.set()
+
+
+def iter_pdf_pages(
+    file_path: str, source_name: Optional[str] = None, pdf_pool: Optional[PagePool] = None
+) -> Iterator[Document]:
+    """
+    Yield one Document per non-empty PDF page, in page order. Parsed page objects
+    are released as soon as their text is extracted. `pdf_pool` lets a batch share worker processes.
     """
-    documents = []
     filename = source_name or os.path.basename(file_path)
 
     try:
-        with pdfplumber.open(file_path) as pdf:
-            for i, page in enumerate(pdf.pages):
-                text = page.extract_text()
-                if text and text.strip():
-                    documents.append(
-                        Document(
-                            page_content=text,
-                            metadata={
-                                "source": filename,
-                                "page": i + 1,
-                                "file_path": file_path,
-                            },
-                        )
-                    )
+        for page_number, text in iter_page_texts(file_path, pdf_pool):
+            yield Document(
+                page_content=text,
+                metadata={
+                    "source": filename,
+                    "page": page_number,
+                    "file_path": file_path,
+                },
+            )
     except Exception as exc:
         print(f"Error loading PDF with pdfplumber: {exc}")
         raise
 
-    return documents
 
+def load_pdf_with_metadata(file_path: str, source_name: Optional[str] = None) -> List[Document]:
+    """
+    Load PDF with page numbers and filename metadata.
+    """
+    return list(iter_pdf_pages(file_path, source_name=source_name))
 
-def split_documents_semantically(documents: List[Document], embeddings) -> List[Document]:
+
+def _token_cap_splitter(embeddings) -> Optional[RecursiveCharacterTextSplitter]:
     """
-    Split documents using Semantic Chunking.
+    Splitter that measures length in the embedding model's own tokens, capped at
+    CHUNK_SIZE and at the model's max sequence length minus its special tokens
+    ([CLS]/[SEP]; longer inputs get truncated when embedded). None when the
+    embeddings expose no tokenizer.
     """
-    print("Splitting documents using Semantic Chunking...")
+    client = getattr(embeddings, "_client", None)
+    tokenizer = getattr(client, "tokenizer", None)
+    if tokenizer is None:
+        return None
+
+    max_seq_length = getattr(client, "max_seq_length", None)
+    if max_seq_length:
+        # tokenize() leaves out the special tokens the model adds around every input.
+        special_tokens = getattr(tokenizer, "num_special_tokens_to_add", lambda: 0)()
+        max_tokens = min(CHUNK_SIZE, max_seq_length - special_tokens)
+    else:
+        max_tokens = CHUNK_SIZE
+    return RecursiveCharacterTextSplitter(
+        chunk_size=max_tokens,
+        chunk_overlap=min(CHUNK_OVERLAP, max_tokens // 2),
+        length_function=lambda text: len(tokenizer.tokenize(text)),
+    )
+
+
+def _chunker_inputs(text: str, text_splitter: SemanticChunker) -> List[str]:
+    """
+    The exact strings SemanticChunker.split_text will pass to embed_documents for `text`.
+    """
+    sentences = re.split(text_splitter.sentence_split_regex, text)
+    if len(sentences) == 1:
+        return []
+    indexed = [{"sentence": sentence, "index": i} for i, sentence in enumerate(sentences)]
+    return [s["combined_sentence"] for s in combine_sentences(indexed, text_splitter.buffer_size)]
+
+
+def iter_semantic_chunks(pages: Iterable[Document], embeddings) -> Iterator[Document]:
+    """
+    Semantically chunk pages, yielding chunks as they are produced.
+    Sentence windows for CHUNKER_PAGE_GROUP pages are embedded in one batched call
+    before the chunker runs page by page against that memo.
+    Chunks longer than the token cap are re-split on token windows.
+    """
+    memo = MemoEmbeddings(embeddings)
     text_splitter = SemanticChunker(
-        embeddings,
+        memo,
         breakpoint_threshold_type="percentile",
     )
-    return text_splitter.split_documents(documents)
+    token_splitter = _token_cap_splitter(embeddings)
+    pages = iter(pages)
+    while True:
+        group = list(islice(pages, CHUNKER_PAGE_GROUP))
+        if not group:
+            break
+        memo.prime(
+            text
+            for page in group
+            for text in _chunker_inputs(page.page_content, text_splitter)
+        )
+        for page in group:
+            for chunk in text_splitter.split_documents([page]):
+                if token_splitter is None:
+                    yield chunk
+                    continue
+                yield from token_splitter.split_documents([chunk])
+        memo.clear()
+
+
+def split_documents_semantically(documents: List[Document], embeddings) -> List[Document]:
+    """
+    Split documents using Semantic Chunking.
+    """
+    print("Splitting documents using Semantic Chunking...")
+    return list(iter_semantic_chunks(documents, embeddings))
+
+
+def _embed_chunks(embeddings, chunks: List[Document]) -> Tuple[List[str], np.ndarray]:
+    """
+    Embed a batch of chunks in one batched call into a float32 (n_chunks, dim) matrix.
+    """
+    texts = [chunk.page_content for chunk in chunks]
+    return texts, encode_documents(embeddings, texts)
+
+
+def _write_chunks(
+    vectorstore,
+    chunks: List[Document],
+    ids: List[str],
+    texts: List[str],
+    vectors: np.ndarray,
+) -> None:
+    """
+    Write precomputed vectors to the collection in UPSERT_BATCH_SIZE slices.
+    """
+    for start in range(0, len(ids), UPSERT_BATCH_SIZE):
+        end = start + UPSERT_BATCH_SIZE
+        vectorstore._collection.upsert(
+            ids=ids[start:end],
+            embeddings=vectors[start:end],
+            metadatas=[chunk.metadata for chunk in chunks[start:end]],
+            documents=texts[start:end],
+        )
+
+
+def _update_metadata(vectorstore, chunks: List[Document], ids: List[str]) -> None:
+    """
+    Refresh metadata of already-stored chunks without touching their vectors.
+    """
+    for start in range(0, len(ids), UPSERT_BATCH_SIZE):
+        end = start + UPSERT_BATCH_SIZE
+        vectorstore._collection.update(
+            ids=ids[start:end],
+            metadatas=[chunk.metadata for chunk in chunks[start:end]],
+        )
+
+
+def _write_batch(vectorstore, new_chunks, new_ids, texts, vectors, known_chunks, known_ids) -> None:
+    if new_ids:
+        _write_chunks(vectorstore, new_chunks, new_ids, texts, vectors)
+    if known_ids:
+        _update_metadata(vectorstore, known_chunks, known_ids)
+
+
+def _chunk_id(source: str, page, text: str) -> str:
+    """
+    Deterministic record id: the same text on the same page of a source maps to the same record.
+    """
+    digest = hashlib.blake2b(f"{page}\x1f{text}".encode("utf-8"), digest_size=16).hexdigest()
+    return f"{source}:{digest}"
 
 
 def _ingest_document_with_resources(
@@ -63,9 +240,12 @@ def _ingest_document_with_resources(
     embeddings,
     vectorstore,
     source_name: Optional[str] = None,
+    content_hash: Optional[str] = None,
+    pdf_pool: Optional[PagePool] = None,
 ) -> Dict[str, int]:
     """
-    Ingest a single PDF using already-initialized embeddings/vectorstore.
+    Ingest a single PDF using already-initialized embeddings/vectorstore (and PDF worker pool).
+    `content_hash` is stored on every chunk so identical re-uploads can be detected.
     """
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"File not found: {file_path}")
@@ -76,25 +256,70 @@ def _ingest_document_with_resources(
     filename = source_name or os.path.basename(file_path)
 
     print("Loading document...")
-    raw_docs = load_pdf_with_metadata(file_path, source_name=filename)
-    if not raw_docs:
+    # Stage 1: PDF parsing runs ahead on its own thread.
+    pages = _prefetch(iter_pdf_pages(file_path, source_name=filename, pdf_pool=pdf_pool))
+    first_page = next(pages, None)
+    if first_page is None:
         raise ValueError("No extractable text found in the PDF.")
-    print(f"Loaded {len(raw_docs)} pages.")
-
-    chunks = split_documents_semantically(raw_docs, embeddings)
-    print(f"Created {len(chunks)} semantic chunks.")
 
-    print(f"Upserting to ChromaDB at {CHROMA_PERSIST_DIRECTORY}...")
-    vectorstore.delete(where={"source": filename})
+    print(f"Chunking and upserting to ChromaDB at {CHROMA_PERSIST_DIRECTORY}...")
+    # Ids are derived from chunk content, so re-ingesting only embeds chunks that changed;
+    # stored ids the new version no longer produces are deleted at the end.
+    previous_ids = set(vectorstore.get(where={"source": filename}, include=[]).get("ids", []))
+
+    # Stage 2: chunk + embed one batch at a time on this thread.
+    # Stage 3: the previous batch is written by a single background writer.
+    chunk_iter = iter_semantic_chunks(chain([first_page], pages), embeddings)
+    page_count = 0
+    chunk_count = 0
+    reused_count = 0
+    last_page = None
+    written_ids = set()
+    with ThreadPoolExecutor(max_workers=1) as writer:
+        pending = None
+        while True:
+            batch = list(islice(chunk_iter, UPSERT_BATCH_SIZE))
+            if not batch:
+                break
+            new_chunks, new_ids, known_chunks, known_ids = [], [], [], []
+            for chunk in batch:
+                page = chunk.metadata.get("page", "na")
+                if page != last_page:
+                    page_count += 1
+                    last_page = page
+                chunk_id = _chunk_id(filename, page, chunk.page_content)
+                if chunk_id in written_ids:
+                    continue  # Same text repeated on the same page
+                written_ids.add(chunk_id)
+                chunk.metadata["chunk_index"] = chunk_count
+                if content_hash:
+                    chunk.metadata["content_hash"] = content_hash
+                chunk_count += 1
+                if chunk_id in previous_ids:
+                    known_chunks.append(chunk)
+                    known_ids.append(chunk_id)
+                else:
+                    new_chunks.append(chunk)
+                    new_ids.append(chunk_id)
+            reused_count += len(known_ids)
+            texts, vectors = _embed_chunks(embeddings, new_chunks) if new_chunks else ([], None)
+            if pending is not None:
+                pending.result()
+            pending = writer.submit(
+                _write_batch, vectorstore, new_chunks, new_ids, texts, vectors, known_chunks, known_ids
+            )
+        if pending is not None:
+            pending.result()
 
-    ids = []
-    for idx, chunk in enumerate(chunks):
-        chunk.metadata["chunk_index"] = idx
-        ids.append(f"{filename}:{chunk.metadata.get('page', 'na')}:{idx}")
+    stale_ids = previous_ids - written_ids
+    if stale_ids:
+        vectorstore.delete(ids=list(stale_ids))
 
-    vectorstore.add_documents(chunks, ids=ids)
+    if reused_count:
+        print(f"Reused {reused_count} unchanged chunks; removed {len(stale_ids)} stale ones.")
+    print(f"Loaded {page_count} pages into {chunk_count} semantic chunks.")
     print("Ingestion Complete!")
-    return {"pages": len(raw_docs), "chunks": len(chunks)}
+    return {"pages": page_count, "chunks": chunk_count}
 
 
 def ingest_document(file_path: str, source_name: Optional[str] = None) -> Dict[str, int]:
@@ -106,8 +331,7 @@ def ingest_document(file_path: str, source_name: Optional[str] = None) -> Dict[s
     if not file_path.lower().endswith(".pdf"):
         raise ValueError("Only PDF files are supported for ingestion.")
 
-    print(f"Initializing Embeddings: {EMBEDDING_MODEL}")
-    embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+    embeddings = get_embeddings()
     print(f"Connecting ChromaDB at {CHROMA_PERSIST_DIRECTORY}...")
     vectorstore = get_chroma_vectorstore(embeddings, allow_repair=True)
     return _ingest_document_with_resources(
@@ -118,64 +342,101 @@ def ingest_document(file_path: str, source_name: Optional[str] = None) -> Dict[s
     )
 
 
-def ingest_documents(file_paths: List[str], source_names: Optional[List[str]] = None) -> Dict[str, object]:
+def ingest_documents(
+    file_paths: List[str],
+    source_names: Optional[List[str]] = None,
+    embedding_batch_size: Optional[int] = None,
+    content_hashes: Optional[List[str]] = None,
+) -> Dict[str, object]:
     """
     Batch ingest multiple PDFs with shared embeddings/vectorstore initialization.
+    `embedding_batch_size` sets how many texts go through each embedding forward pass.
+    `content_hashes` (one per file) are stored in chunk metadata for find_indexed_sources.
     """
     if not file_paths:
         return {"ingested": [], "failed": [], "total_chunks": 0}
 
     if source_names and len(source_names) != len(file_paths):
         raise ValueError("source_names length must match file_paths length.")
-
-    print(f"Initializing Embeddings once for batch: {EMBEDDING_MODEL}")
-    embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+    if content_hashes and len(content_hashes) != len(file_paths):
+        raise ValueError("content_hashes length must match file_paths length.")
+    if embedding_batch_size is not None and embedding_batch_size < 1:
+        raise ValueError("embedding_batch_size must be a positive integer.")
+
+    shared_embeddings = get_embeddings()
+    embeddings = shared_embeddings
+    if embedding_batch_size is not None:
+        embeddings = with_batch_size(shared_embeddings, embedding_batch_size)
     print(f"Connecting ChromaDB once for batch at {CHROMA_PERSIST_DIRECTORY}...")
-    vectorstore = get_chroma_vectorstore(embeddings, allow_repair=True)
+    # Keyed on the shared model so the cached Chroma handle is reused across uploads.
+    vectorstore = get_chroma_vectorstore(shared_embeddings, allow_repair=True)
+
+    # Files are parsed one after another; start their disk reads now.
+    prefetch_files(file_paths)
 
     ingested = []
     failed = []
     total_chunks = 0
 
-    for idx, file_path in enumerate(file_paths):
-        source_name = source_names[idx] if source_names else None
-        try:
-            stats = _ingest_document_with_resources(
-                file_path=file_path,
-                embeddings=embeddings,
-                vectorstore=vectorstore,
-                source_name=source_name,
-            )
-            total_chunks += stats["chunks"]
-            ingested.append(
-                {
-                    "file_path": file_path,
-                    "source": source_name or os.path.basename(file_path),
-                    "pages": stats["pages"],
-                    "chunks": stats["chunks"],
-                }
-            )
-        except Exception as exc:
-            failed.append(
-                {
-                    "file_path": file_path,
-                    "source": source_name or os.path.basename(file_path),
-                    "error": str(exc),
-                }
-            )
+    # One PDF worker pool for the whole batch, started only if some file is large enough.
+    with PagePool() as pdf_pool:
+        for idx, file_path in enumerate(file_paths):
+            source_name = source_names[idx] if source_names else None
+            try:
+                stats = _ingest_document_with_resources(
+                    file_path=file_path,
+                    embeddings=embeddings,
+                    vectorstore=vectorstore,
+                    source_name=source_name,
+                    content_hash=content_hashes[idx] if content_hashes else None,
+                    pdf_pool=pdf_pool,
+                )
+                total_chunks += stats["chunks"]
+                ingested.append(
+                    {
+                        "file_path": file_path,
+                        "source": source_name or os.path.basename(file_path),
+                        "pages": stats["pages"],
+                        "chunks": stats["chunks"],
+                    }
+                )
+            except Exception as exc:
+                failed.append(
+                    {
+                        "file_path": file_path,
+                        "source": source_name or os.path.basename(file_path),
+                        "error": str(exc),
+                    }
+                )
 
     return {"ingested": ingested, "failed": failed, "total_chunks": total_chunks}
 
 
+def find_indexed_sources(content_hashes: List[str]) -> Dict[str, str]:
+    """
+    Map each content hash that already has chunks in the index to its source name.
+    """
+    if not content_hashes:
+        return {}
+
+    vectorstore = get_chroma_vectorstore(get_embeddings(), allow_repair=True)
+    found = {}
+    for content_hash in dict.fromkeys(content_hashes):
+        data = vectorstore.get(where={"content_hash": content_hash}, limit=1, include=["metadatas"])
+        metadatas = data.get("metadatas", []) if data else []
+        if metadatas:
+            found[content_hash] = (metadatas[0] or {}).get("source", "Unknown")
+    return found
+
+
 def clear_vectorstore() -> int:
     """
     Remove all documents from the current ChromaDB collection.
     Returns number of deleted records.
     """
-    print(f"Initializing Embeddings for clear operation: {EMBEDDING_MODEL}")
-    embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+    embeddings = get_embeddings()
     vectorstore = get_chroma_vectorstore(embeddings, allow_repair=True)
-    data = vectorstore.get()
+    data = vectorstore.get(include=[])  # Ids only; documents/metadata aren't needed to delete
     ids = data.get("ids", []) if data else []
     if ids:
         vectorstore.delete(ids=ids)
@@ -0,0 +1,122 @@
+"""
+PDF page-text extraction that can run in worker processes.
+
+Kept free of the LangChain/model imports so spawned workers start quickly.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import pdfplumber
+
+PAGES_PER_TASK = 16  # Page range handed to one worker call; PDFs with a single range are parsed serially
+
+
+def prefetch_files(file_paths: Iterable[str]) -> None:
+    """
+    Ask the kernel to start reading whole files into the page cache without blocking,
+    so later files in a batch are already in memory when pdfplumber opens them.
+    No-op where posix_fadvise is unavailable (macOS, Windows).
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+    for path in file_paths:
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            continue  # Reported by the ingestion step that opens the file.
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+
+class PagePool:
+    """
+    Process pool shared by every PDF parsed inside one `with` block, so a batch pays
+    worker start-up (spawn + pdfplumber import) at most once. Workers start on first use.
+    """
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: the caller may be multi-threaded (Streamlit, prefetch threads), where fork is unsafe.
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def discard(self) -> None:
+        """
+        Drop a broken executor; the next executor() call starts a fresh one.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def __enter__(self) -> "PagePool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+def page_count(file_path: str) -> int:
+    with pdfplumber.open(file_path) as pdf:
+        return len(pdf.pages)
+
+
+def extract_page_range(file_path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """
+    Return (1-based page number, text) for non-empty pages in [start, end).
+    Each call opens its own handle, so it is safe to run in a separate process.
+    """
+    rows = []
+    with pdfplumber.open(file_path) as pdf:
+        for i in range(start, end):
+            page = pdf.pages[i]
+            text = page.extract_text()
+            page.close()
+            if text and text.strip():
+                rows.append((i + 1, text))
+    return rows
+
+
+def iter_page_texts(file_path: str, pool: Optional[PagePool] = None) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (page number, text) in page order. Layout analysis is pure Python, so
+    PDFs spanning several PAGES_PER_TASK ranges are parsed by a process pool:
+    `pool` when given, otherwise one started for this file.
+    """
+    total = page_count(file_path)
+    starts = list(range(0, total, PAGES_PER_TASK))
+    if len(starts) < 2 or (os.cpu_count() or 1) < 2:
+        yield from extract_page_range(file_path, 0, total)
+        return
+    if pool is None:
+        with PagePool(max_workers=len(starts)) as own_pool:
+            yield from iter_page_texts(file_path, own_pool)
+        return
+
+    ends = [min(start + PAGES_PER_TASK, total) for start in starts]
+    done = 0  # Pages [0, done) have been yielded
+    try:
+        ranges = pool.executor().map(extract_page_range, [file_path] * len(starts), starts, ends)
+        for end, rows in zip(ends, ranges):
+            yield from rows
+            done = end
+    except BrokenProcessPool as exc:
+        print(f"[PDF] Worker pool failed ({exc}); parsing remaining pages serially.")
+        pool.discard()
+        yield from extract_page_range(file_path, done, total)
@@ -1,21 +1,55 @@
 
-from typing import Any, List, Optional, Set
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.retrievers import BM25Retriever
+import asyncio
+import hashlib
+import re
+import shutil
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from operator import itemgetter
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
 from langchain_community.cross_encoders import HuggingFaceCrossEncoder
 from langchain_core.documents import Document
 from langchain_core.retrievers import BaseRetriever
-from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
 import os
 from src.config import (
-    EMBEDDING_MODEL,
+    CHROMA_PERSIST_DIRECTORY,
     TOP_K,
-    RERANK_TOP_K
+    RERANK_CANDIDATES,
+    RERANK_TOP_K,
+    RERANKER_BACKEND,
+    RERANKER_MODEL,
 )
+from src.bm25 import NumpyBM25Retriever
+from src.cache.rerank_cache import get_rerank_cache
+from src.embeddings import _model_kwargs, get_embeddings, resolve_device
 from src.vectorstore import get_chroma_vectorstore
 
+RRF_K = 60  # Reciprocal Rank Fusion damping constant
+# BM25, dense. A dense/BM25 ratio above (RRF_K + TOP_K) / (RRF_K + 1), ~1.15 by default,
+# would rank the whole dense top-k above BM25 rank 1, so the lists are weighted equally.
+HYBRID_WEIGHTS = [0.5, 0.5]
+CORPUS_PAGE_SIZE = 10_000  # Chunks fetched per Chroma get() when building BM25
+BM25_CACHE_DIR = "bm25"  # Memory-mapped BM25 index kept next to the Chroma files, keyed by corpus ids
+BM25_POINTER_FILE = "CURRENT"  # "<version directory>\n<corpus fingerprint>" of the live index
+LEGACY_BM25_FILES = ("bm25.pkl",)  # Older on-disk formats, removed on the next save
+
 # --- SAFE INLINE IMPLEMENTATIONS ---
 
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _dedup_key(text: str) -> bytes:
+    """
+    8-byte digest that treats chunks differing only in case or whitespace as the same.
+    """
+    normalized = _WHITESPACE.sub(" ", text.strip().lower())
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).digest()
+
+
 class SimpleEnsembleRetriever(BaseRetriever):
     """
     Inline implementation of EnsembleRetriever.
@@ -26,20 +60,42 @@ class SimpleEnsembleRetriever(BaseRetriever):
     def _get_relevant_documents(
         self, query: str, *, run_manager: CallbackManagerForRetrieverRun
     ) -> List[Document]:
-        all_docs_lists = [retriever.invoke(query) for retriever in self.retrievers]
-        
+        if len(self.retrievers) == 1:
+            return self._merge([self.retrievers[0].invoke(query)])
+        # Sub-retrievers are independent, so total latency is the slowest one, not the sum.
+        with ThreadPoolExecutor(max_workers=len(self.retrievers)) as executor:
+            all_docs_lists = list(executor.map(lambda retriever: retriever.invoke(query), self.retrievers))
+        return self._merge(all_docs_lists)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        all_docs_lists = await asyncio.gather(*(retriever.ainvoke(query) for retriever in self.retrievers))
+        return self._merge(list(all_docs_lists))
+
+    def _merge(self, all_docs_lists: List[List[Document]]) -> List[Document]:
+        """
+        Weighted Reciprocal Rank Fusion: each list adds weight / (RRF_K + rank) per document,
+        with documents identified by a hash of their case- and whitespace-normalized text.
+        """
+        weights = self.weights or [1.0] * len(all_docs_lists)
+        scores: Dict[bytes, float] = {}
+        best: Dict[bytes, Tuple[float, int]] = {}
+        canonical: Dict[bytes, Document] = {}
+        for j, (weight, doc_list) in enumerate(zip(weights, all_docs_lists)):
+            for rank, doc in enumerate(doc_list, start=1):
+                key = _dedup_key(doc.page_content)
+                contribution = weight / (RRF_K + rank)
+                scores[key] = scores.get(key, 0.0) + contribution
+                canonical.setdefault(key, doc)
+                if key not in best or contribution > best[key][0]:
+                    best[key] = (contribution, j)
+
         combined_docs = []
-        seen_content = set()
-        max_len = max(len(l) for l in all_docs_lists)
-        for i in range(max_len):
-            for j, doc_list in enumerate(all_docs_lists):
-                if i < len(doc_list):
-                    doc = doc_list[i]
-                    content_hash = hash(doc.page_content)
-                    if content_hash not in seen_content:
-                        seen_content.add(content_hash)
-                        doc.metadata["retriever_source"] = f"retriever_{j}"
-                        combined_docs.append(doc)
+        for key, _ in sorted(scores.items(), key=itemgetter(1), reverse=True):
+            doc = canonical[key]
+            doc.metadata["retriever_source"] = f"retriever_{best[key][1]}"
+            combined_docs.append(doc)
         return combined_docs
 
 
@@ -47,30 +103,56 @@ class SafeCrossEncoderReranker:
     """
     Inline implementation of CrossEncoderReranker that checks for .score() vs .predict().
     """
-    def __init__(self, model, top_n=3):
+    def __init__(self, model, top_n=3, batch_size=32, cache=None):
         self.model = model
         self.top_n = top_n
+        self.batch_size = batch_size
+        self.cache = cache
+
+    def _score(self, pairs: Iterable[Tuple[str, str]]):
+        # 1. Try .score() (LangChain standard); it takes no batch size, so feed it
+        # one batch at a time, materializing only that batch.
+        if hasattr(self.model, 'score'):
+            pairs = iter(pairs)
+            batches = iter(lambda: list(islice(pairs, self.batch_size)), [])
+            return np.concatenate([
+                np.asarray(self.model.score(batch), dtype=np.float32).reshape(-1) for batch in batches
+            ])
+        # 2. Try .predict() (SentenceTransformers standard)
+        if hasattr(self.model, 'predict'):
+            return self.model.predict(list(pairs), batch_size=self.batch_size, show_progress_bar=False)
+        return None
 
     def compress_documents(self, documents: List[Document], query: str) -> List[Document]:
         if not documents: return []
-        
-        # Prepare pairs for cross-encoder
-        pairs = [[query, doc.page_content] for doc in documents]
-        
-        scores = []
-        try:
-            # 1. Try .score() (LangChain standard)
-            if hasattr(self.model, 'score'):
-                scores = self.model.score(pairs)
-            # 2. Try .predict() (SentenceTransformers standard)
-            elif hasattr(self.model, 'predict'):
-                scores = self.model.predict(pairs)
-            else:
+
+        texts = [doc.page_content for doc in documents]
+        # Only pairs the score cache doesn't know go through the cross-encoder.
+        scores = [None] * len(texts)
+        if self.cache is not None:
+            try:
+                scores = self.cache.get_many(query, texts)
+            except Exception as e:
+                # An unreadable cache only costs the model call, never the rerank itself.
+                print(f"[Reranker Warning] Could not read cached scores: {e}")
+        missing = [i for i, score in enumerate(scores) if score is None]
+
+        if missing:
+            try:
+                fresh = self._score((query, texts[i]) for i in missing)
+            except Exception as e:
+                print(f"[Reranker Error] Scoring failed: {e}")
+                return documents[:self.top_n]
+            if fresh is None:
                 print(f"[Reranker Warning] Model {type(self.model)} has neither score() nor predict().")
                 return documents[:self.top_n]
-        except Exception as e:
-             print(f"[Reranker Error] Scoring failed: {e}")
-             return documents[:self.top_n]
+            for i, score in zip(missing, fresh):
+                scores[i] = float(score)
+            if self.cache is not None:
+                try:
+                    self.cache.set_many(query, [texts[i] for i in missing], [scores[i] for i in missing])
+                except Exception as e:
+                    print(f"[Reranker Warning] Could not store scores: {e}")
 
         # Combine and Sort
         doc_score_pairs = list(zip(documents, scores))
@@ -85,29 +167,162 @@ class SafeCrossEncoderReranker:
         return top_docs
 
 
+# Quoted phrase, bare file name or single token: exact-match lookups gain little from rescoring.
+_LITERAL_QUERY = re.compile(r'^(?:"[^"]+"|\S+\.(?:pdf|txt|md)|\S+)$', re.IGNORECASE)
+
+
+def _is_literal(query: str) -> bool:
+    return bool(_LITERAL_QUERY.match(query.strip()))
+
+
 class SafeContextualCompressionRetriever(BaseRetriever):
     """
     Inline wrapper for compression to avoid import errors.
     """
     base_compressor: Any
     base_retriever: Any
+    # Cascade: only this many of the best fused hybrid hits reach the cross-encoder.
+    max_candidates: Optional[int] = None
+    # Literal queries keep this retriever's (BM25's) own ranking instead of being reranked.
+    literal_retriever: Optional[BaseRetriever] = None
     
     def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
-        docs = self.base_retriever.invoke(query)
+        return self.rerank(query, self.base_retriever.invoke(query))
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        docs = await self.base_retriever.ainvoke(query)
+        # The cross-encoder is CPU/GPU bound; keep it off the event loop.
+        return await asyncio.to_thread(self.rerank, query, docs)
+
+    def rerank(self, query: str, docs: List[Document]) -> List[Document]:
+        """
+        Rerank already-retrieved candidates (e.g. after source filtering).
+        """
+        if self.literal_retriever is not None and _is_literal(query):
+            # Only keyword hits that survived source filtering; none means rerank as usual.
+            allowed = {_dedup_key(doc.page_content) for doc in docs}
+            hits = [doc for doc in self.literal_retriever.invoke(query) if _dedup_key(doc.page_content) in allowed]
+            if hits:
+                return hits[:self.base_compressor.top_n]
+        if self.max_candidates is not None:
+            docs = docs[:self.max_candidates]
         return self.base_compressor.compress_documents(docs, query)
 
 
+def _cross_encoder_kwargs(backend: str = RERANKER_BACKEND) -> dict:
+    """
+    CrossEncoder kwargs, chosen like the embedder's: int8-quantized CPU exports for
+    onnx/openvino, and SDPA attention (plus fp16 weights on CUDA) for torch.
+    """
+    if backend in ("onnx", "openvino"):
+        return _model_kwargs("cpu", backend=backend)
+    return _model_kwargs(resolve_device(), backend="torch")
+
+
+@lru_cache(maxsize=1)
+def get_cross_encoder() -> HuggingFaceCrossEncoder:
+    """
+    Load the reranker once per process; reset_retriever() keeps it, so a rebuilt
+    retriever doesn't reload the weights.
+    """
+    print(f"Initializing Cross-Encoder: {RERANKER_MODEL} ({RERANKER_BACKEND})")
+    return HuggingFaceCrossEncoder(model_name=RERANKER_MODEL, model_kwargs=_cross_encoder_kwargs())
+
+
+def reset_cross_encoder():
+    get_cross_encoder.cache_clear()
+
+
+def _corpus_fingerprint(ids: List[str]) -> str:
+    return hashlib.sha1("\n".join(sorted(ids)).encode("utf-8")).hexdigest()
+
+
+def _load_cached_bm25(directory: str, fingerprint: str) -> Optional[NumpyBM25Retriever]:
+    """
+    The saved BM25 index, or None when it is missing, unreadable or built from a different corpus.
+    """
+    try:
+        with open(os.path.join(directory, BM25_POINTER_FILE), encoding="utf-8") as f:
+            version, cached_fingerprint = f.read().split("\n")
+        if cached_fingerprint != fingerprint:
+            return None
+        return NumpyBM25Retriever.load(os.path.join(directory, version))
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"[BM25 Cache] Ignoring unreadable cache: {e}")
+        return None
+
+
+def _save_cached_bm25(directory: str, fingerprint: str, retriever: NumpyBM25Retriever) -> None:
+    """
+    Write the index to a fresh version directory, then switch the pointer file to it.
+    Files a running retriever has memory-mapped are never overwritten (Windows refuses
+    to replace them), and a half-written version is never pointed at.
+    """
+    version = uuid.uuid4().hex
+    pointer_path = os.path.join(directory, BM25_POINTER_FILE)
+    try:
+        retriever.save(os.path.join(directory, version))
+        with open(f"{pointer_path}.tmp", "w", encoding="utf-8") as f:
+            f.write(f"{version}\n{fingerprint}")
+        os.replace(f"{pointer_path}.tmp", pointer_path)
+    except Exception as e:
+        print(f"[BM25 Cache] Could not save index: {e}")
+        return
+    _prune_bm25_cache(directory, keep=version)
+
+
+def _prune_bm25_cache(directory: str, keep: str) -> None:
+    """
+    Best-effort removal of superseded versions and legacy files; anything still
+    mapped elsewhere (e.g. on Windows) is left for a later save.
+    """
+    for legacy in LEGACY_BM25_FILES:
+        try:
+            os.remove(os.path.join(os.path.dirname(directory), legacy))
+        except OSError:
+            pass
+    for entry in os.scandir(directory):
+        if entry.name in (keep, BM25_POINTER_FILE):
+            continue
+        try:
+            if entry.is_dir():
+                shutil.rmtree(entry.path)
+            else:
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+
 class AdvancedRetriever:
     """
     Handles Hybrid Search (BM25 + Vector) and Reranking using ChromaDB.
     """
     def __init__(self):
         print("Initializing AdvancedRetriever...")
-        self.embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+        self.embeddings = get_embeddings()
         self.vectorstore = get_chroma_vectorstore(self.embeddings, allow_repair=True)
         self.retrieve_chain = None
         self._initialize_retrievers()
 
+    def _load_corpus(self) -> Tuple[List[str], List[Document]]:
+        """
+        Read every chunk's text and metadata (never its embedding) in CORPUS_PAGE_SIZE pages.
+        """
+        ids: List[str] = []
+        docs: List[Document] = []
+        while True:
+            page = self.vectorstore.get(
+                include=["documents", "metadatas"], limit=CORPUS_PAGE_SIZE, offset=len(ids)
+            )
+            ids.extend(page['ids'])
+            docs.extend(Document(page_content=t, metadata=m or {}) for t, m in zip(page['documents'], page['metadatas']))
+            if len(page['ids']) < CORPUS_PAGE_SIZE:
+                return ids, docs
+
     def _initialize_retrievers(self):
         # 1. Vector Retriever
         vector_retriever = self.vectorstore.as_retriever(search_kwargs={"k": TOP_K})
@@ -115,26 +330,31 @@ class AdvancedRetriever:
         # 2. BM25 Retriever
         bm25_retriever = None
         try:
-            collection_data = self.vectorstore.get() 
-            texts = collection_data['documents']
-            metadatas = collection_data['metadatas']
-            
-            if texts:
-                print(f"Initializing BM25 Retriever with {len(texts)} documents.")
-                docs = [Document(page_content=t, metadata=m) for t, m in zip(texts, metadatas)]
-                bm25_retriever = BM25Retriever.from_documents(docs)
+            ids = self.vectorstore.get(include=[])['ids']
+            if ids:
+                cache_path = os.path.join(CHROMA_PERSIST_DIRECTORY, BM25_CACHE_DIR)
+                bm25_retriever = _load_cached_bm25(cache_path, _corpus_fingerprint(ids))
+                if bm25_retriever is not None:
+                    print(f"Loaded BM25 index for {len(ids)} documents from cache.")
+                else:
+                    corpus_ids, docs = self._load_corpus()
+                    print(f"Initializing BM25 Retriever with {len(docs)} documents.")
+                    bm25_retriever = NumpyBM25Retriever.from_documents(docs)
+                    _save_cached_bm25(cache_path, _corpus_fingerprint(corpus_ids), bm25_retriever)
                 bm25_retriever.k = TOP_K
             else:
                 print("ChromaDB is empty. BM25 Retriever skipped.")
         except Exception as e:
             print(f"Error initializing BM25: {e}")
 
+        self.bm25_retriever = bm25_retriever
+
         # 3. Hybrid Base
         if bm25_retriever:
             print("Using SimpleEnsembleRetriever (Hybrid).")
             self.base_retriever = SimpleEnsembleRetriever(
                 retrievers=[bm25_retriever, vector_retriever],
-                weights=[0.3, 0.7]
+                weights=HYBRID_WEIGHTS
             )
         else:
             print("Using Vector-Only Retriever.")
@@ -142,17 +362,32 @@ class AdvancedRetriever:
 
         # 4. Reranker
         print("Initializing SafeCrossEncoderReranker.")
-        model = HuggingFaceCrossEncoder(model_name="cross-encoder/ms-marco-MiniLM-L-6-v2")
+        self.cross_encoder = get_cross_encoder()
         
         # ALWAYS use our safe inline class to guarantee behavior
-        compressor = SafeCrossEncoderReranker(model=model, top_n=RERANK_TOP_K)
+        compressor = SafeCrossEncoderReranker(
+            model=self.cross_encoder, top_n=RERANK_TOP_K, cache=get_rerank_cache()
+        )
         
         # Wrap in our safe retriever
         self.retrieve_chain = SafeContextualCompressionRetriever(
             base_compressor=compressor,
-            base_retriever=self.base_retriever
+            base_retriever=self.base_retriever,
+            max_candidates=RERANK_CANDIDATES,
+            literal_retriever=bm25_retriever,
         )
 
+    def warm_up(self) -> None:
+        """
+        Push one tiny input through the embedder and cross-encoder so the first real
+        question doesn't pay for lazy weight loading and kernel initialization.
+        """
+        try:
+            self.embeddings.embed_query("warmup")
+            self.cross_encoder.score([("warmup", "warmup")])
+        except Exception as e:
+            print(f"[Warmup] Retriever warm-up failed: {e}")
+
     def _filter_by_sources(self, docs: List[Document], source_filter: Optional[List[str]]) -> List[Document]:
         if not source_filter:
             return docs
@@ -167,17 +402,74 @@ class AdvancedRetriever:
         """
         print(f"Retrieving for query: {query}")
         try:
-            # Try full chain
-            docs = self.retrieve_chain.invoke(query)
+            # Filter before reranking so the cross-encoder only scores usable candidates.
+            candidates = self._filter_by_sources(self.base_retriever.invoke(query), source_filter)
+        except Exception as e:
+            print(f"!!! Error in Base Retrieval: {e}")
+            return []
+        try:
+            return self.retrieve_chain.rerank(query, candidates)
         except Exception as e:
+            # Fallback to the unreranked candidates
             print(f"!!! Error in Reranking Chain: {e}")
-            try:
-                # Fallback to base
-                docs = self.base_retriever.invoke(query)
-            except Exception as e2:
-                print(f"!!! Error in Base Retrieval: {e2}")
-                return []
-        return self._filter_by_sources(docs, source_filter)
+            return candidates
+
+    async def aget_relevant_documents(self, query: str, source_filter: Optional[List[str]] = None) -> List[Document]:
+        """
+        Async get_relevant_documents: hybrid retrieval is awaited, reranking runs in a worker thread.
+        """
+        print(f"Retrieving for query: {query}")
+        try:
+            candidates = self._filter_by_sources(await self.base_retriever.ainvoke(query), source_filter)
+        except Exception as e:
+            print(f"!!! Error in Base Retrieval: {e}")
+            return []
+        try:
+            return await asyncio.to_thread(self.retrieve_chain.rerank, query, candidates)
+        except Exception as e:
+            print(f"!!! Error in Reranking Chain: {e}")
+            return candidates
+
+    def _batch_candidates(self, queries: List[str]) -> List[List[Document]]:
+        """
+        Hybrid candidates for all queries at once: one batched embedding pass for the
+        dense side and one sparse matrix product for BM25, fused per query.
+        """
+        vectors = self.embeddings.embed_documents(list(queries))
+        dense = [self.vectorstore.similarity_search_by_vector(vector, k=TOP_K) for vector in vectors]
+        if self.bm25_retriever is None:
+            return dense
+        keyword = self.bm25_retriever.batch_invoke(queries)
+        return [self.base_retriever._merge([kw, dn]) for kw, dn in zip(keyword, dense)]
+
+    async def aget_batch(
+        self, queries: List[str], source_filter: Optional[List[str]] = None, concurrency: int = 8
+    ) -> List[List[Document]]:
+        """
+        Retrieve for many queries, with at most `concurrency` reranks in flight. Results keep query order.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        try:
+            candidate_lists = await asyncio.to_thread(self._batch_candidates, queries)
+        except Exception as e:
+            print(f"[Batch Retrieval] Falling back to per-query retrieval: {e}")
+
+            async def _one(query: str) -> List[Document]:
+                async with semaphore:
+                    return await self.aget_relevant_documents(query, source_filter=source_filter)
+
+            return list(await asyncio.gather(*(_one(query) for query in queries)))
+
+        async def _rerank(query: str, candidates: List[Document]) -> List[Document]:
+            candidates = self._filter_by_sources(candidates, source_filter)
+            async with semaphore:
+                try:
+                    return await asyncio.to_thread(self.retrieve_chain.rerank, query, candidates)
+                except Exception as e:
+                    print(f"!!! Error in Reranking Chain: {e}")
+                    return candidates
+
+        return list(await asyncio.gather(*(_rerank(q, c) for q, c in zip(queries, candidate_lists))))
 
 # Global instance
 _retriever_instance = None
@@ -6,6 +6,7 @@ from __future__ import annotations
 
 import os
 import shutil
+import threading
 from datetime import datetime
 
 from langchain_chroma import Chroma
@@ -27,13 +28,14 @@ def repair_chroma_directory() -> str:
     source_dir = CHROMA_PERSIST_DIRECTORY
     backup_dir = f"{source_dir}_corrupt_{ts}"
 
+    reset_chroma_vectorstore()
     if os.path.isdir(source_dir):
         shutil.move(source_dir, backup_dir)
     os.makedirs(source_dir, exist_ok=True)
     return backup_dir
 
 
-def get_chroma_vectorstore(embeddings, allow_repair: bool = True) -> Chroma:
+def _build_chroma_vectorstore(embeddings, allow_repair: bool) -> Chroma:
     """
     Build a Chroma vectorstore and auto-repair the persistence directory once
     when known Rust/tenant corruption errors occur.
@@ -56,3 +58,28 @@ def get_chroma_vectorstore(embeddings, allow_repair: bool = True) -> Chroma:
             persist_directory=CHROMA_PERSIST_DIRECTORY,
             embedding_function=embeddings,
         )
+
+
+# Global instance
+_vectorstore_instance = None
+_vectorstore_embeddings = None
+_vectorstore_lock = threading.RLock()
+
+def get_chroma_vectorstore(embeddings, allow_repair: bool = True) -> Chroma:
+    """
+    Return the process-wide Chroma handle, opening it on first use.
+    The handle is reused for as long as callers pass the same embeddings object.
+    """
+    global _vectorstore_instance, _vectorstore_embeddings
+    with _vectorstore_lock:
+        if _vectorstore_instance is None or _vectorstore_embeddings is not embeddings:
+            _vectorstore_instance = _build_chroma_vectorstore(embeddings, allow_repair)
+            _vectorstore_embeddings = embeddings
+        return _vectorstore_instance
+
+
+def reset_chroma_vectorstore():
+    global _vectorstore_instance, _vectorstore_embeddings
+    with _vectorstore_lock:
+        _vectorstore_instance = None
+        _vectorstore_embeddings = None
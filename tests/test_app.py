@@ -0,0 +1,41 @@
+import pytest
+
+
+@pytest.fixture
+def app(monkeypatch):
+    import src.config as config
+
+    # No background model load when the module is imported outside `streamlit run`.
+    monkeypatch.setattr(config, "RAG_WARMUP", False)
+    import app
+
+    return app
+
+
+def test_evidence_blocks_survive_blank_lines_in_chunks(app):
+    text = "Intro line\n\n    indented code?\r\n\r\n# not a heading\n<b>tag</b>"
+    rendered = app._evidence_html([{"page_content": text, "metadata": {"source": "a.pdf", "page": 2}}])
+
+    assert "\n" not in rendered and "\r" not in rendered
+    assert "Intro line&#10;&#10;    indented code?&#10;&#10;# not a heading&#10;&lt;b&gt;tag&lt;/b&gt;" in rendered
+
+    markdown_it = pytest.importorskip("markdown_it")
+    html_out = markdown_it.MarkdownIt("commonmark").render(rendered)
+    assert "<h1>" not in html_out and "<code>" not in html_out and "<p>" not in html_out
+
+
+def test_failed_warmup_is_recorded_so_reruns_do_not_retry(app, monkeypatch):
+    calls = []
+
+    def _failing_generator():
+        calls.append(True)
+        raise RuntimeError("HUGGINGFACE_API_KEY is required")
+
+    monkeypatch.setattr(app, "RAG_WARMUP", True)
+    monkeypatch.setattr(app, "_cached_generator", _failing_generator)
+    app._start_warmup()
+    app.st.session_state._warmup.join()
+
+    assert calls == [True]
+    assert app._warmup_failed() and not app._warmup_pending()
+    assert app.st.session_state._warmup_outcome["error"] == "HUGGINGFACE_API_KEY is required"
@@ -0,0 +1,51 @@
+import numpy as np
+from langchain_core.documents import Document
+
+from src.bm25 import NumpyBM25Retriever, StoredDocuments, tokenize
+
+
+def _docs(*texts):
+    return [Document(page_content=text, metadata={"i": i}) for i, text in enumerate(texts)]
+
+
+def test_tokenize_lowercases_and_drops_punctuation():
+    assert tokenize("Termination: 30-day NOTICE.") == ["termination", "30", "day", "notice"]
+
+
+def test_ranks_rarer_and_repeated_terms_higher_and_skips_non_matches():
+    retriever = NumpyBM25Retriever.from_documents(
+        _docs(
+            "the contract term is twelve months",
+            "termination requires notice; notice must be written",
+            "the notice period is thirty days",
+            "unrelated appendix",
+        ),
+        k=3,
+    )
+    assert [d.metadata["i"] for d in retriever.invoke("Notice of termination")] == [1, 2]
+    assert retriever.invoke("nothing matches") == []
+
+
+def test_batch_scores_match_single_queries():
+    retriever = NumpyBM25Retriever.from_documents(_docs("alpha beta", "beta gamma", "gamma delta delta"))
+    queries = ["beta", "delta gamma", "zeta"]
+    batch = retriever.score_batch(queries)
+
+    assert batch.shape == (3, 3)
+    for column, query in enumerate(queries):
+        np.testing.assert_allclose(batch[:, column], retriever.score_batch([query])[:, 0])
+    assert not batch[:, 2].any()
+
+
+def test_saved_index_is_memory_mapped_and_scores_the_same(tmp_path):
+    retriever = NumpyBM25Retriever.from_documents(_docs("alpha beta", "beta gamma", "gamma delta delta"))
+    retriever.save(str(tmp_path))
+    loaded = NumpyBM25Retriever.load(str(tmp_path), k=2)
+
+    assert not loaded.weights.data.flags.writeable  # Read-only mapping, not a private copy
+    assert isinstance(loaded.docs, StoredDocuments) and len(loaded.docs) == 3
+    assert (loaded.docs[-1].page_content, loaded.docs[-1].metadata) == ("gamma delta delta", {"i": 2})
+    assert loaded.vocabulary == retriever.vocabulary and loaded.k == 2
+    queries = ["beta", "delta gamma"]
+    np.testing.assert_allclose(loaded.score_batch(queries), retriever.score_batch(queries))
+    assert [d.metadata["i"] for d in loaded.invoke("gamma")] == [d.metadata["i"] for d in retriever.invoke("gamma")][:2]
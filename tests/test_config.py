@@ -0,0 +1,22 @@
+import dataclasses
+
+import pytest
+
+from src import config
+
+
+def test_config_is_frozen_and_aliased():
+    assert config.TOP_K == config.CFG.TOP_K
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        config.CFG.TOP_K = 1
+
+
+def test_config_rejects_invalid_values():
+    with pytest.raises(ValueError, match="TOP_K must be a positive integer"):
+        dataclasses.replace(config.CFG, TOP_K=0)
+    with pytest.raises(ValueError, match="RERANK_TOP_K must not exceed TOP_K"):
+        dataclasses.replace(config.CFG, TOP_K=2, RERANK_TOP_K=3)
+    with pytest.raises(ValueError, match="RERANK_TOP_K must not exceed RERANK_CANDIDATES"):
+        dataclasses.replace(config.CFG, RERANK_TOP_K=3, RERANK_CANDIDATES=2)
+    with pytest.raises(ValueError, match="EMBEDDING_BACKEND"):
+        dataclasses.replace(config.CFG, EMBEDDING_BACKEND="tensorflow")
@@ -0,0 +1,114 @@
+from src.embeddings import (
+    ONNX_FP32_FILE,
+    ONNX_QINT8_AVX512_FILE,
+    ONNX_QINT8_VNNI_FILE,
+    ONNX_QUINT8_AVX2_FILE,
+    onnx_file_name,
+    resolve_device,
+)
+
+
+def test_onnx_file_name_prefers_int8_on_vnni_cpus(tmp_path):
+    cpuinfo = tmp_path / "cpuinfo"
+    cpuinfo.write_text("processor\t: 0\nflags\t\t: fpu sse2 avx2 avx512f avx512_vnni\n", encoding="utf-8")
+    assert onnx_file_name(str(cpuinfo)) == ONNX_QINT8_VNNI_FILE
+
+
+def test_onnx_file_name_matches_the_cpu_instruction_set(tmp_path):
+    cpuinfo = tmp_path / "cpuinfo"
+    for flags, expected in (
+        ("fpu sse2 avx2 avx512f", ONNX_QINT8_AVX512_FILE),
+        ("fpu sse2 avx2", ONNX_QUINT8_AVX2_FILE),
+        ("fpu sse2", ONNX_FP32_FILE),
+    ):
+        cpuinfo.write_text(f"processor\t: 0\nflags\t\t: {flags}\n", encoding="utf-8")
+        assert onnx_file_name(str(cpuinfo)) == expected
+    assert onnx_file_name(str(tmp_path / "missing")) == ONNX_FP32_FILE
+
+
+def test_resolve_device_keeps_explicit_choice():
+    assert resolve_device("cuda:1") == "cuda:1"
+    assert resolve_device("auto") in {"cpu", "cuda"}
+
+
+def test_cuda_devices_load_half_precision_weights():
+    from src.embeddings import _model_kwargs
+
+    assert _model_kwargs("cuda", backend="torch")["model_kwargs"] == {
+        "attn_implementation": "sdpa",
+        "torch_dtype": "float16",
+    }
+    assert _model_kwargs("cpu", backend="torch") == {
+        "device": "cpu",
+        "model_kwargs": {"attn_implementation": "sdpa"},
+    }
+
+
+def test_encode_documents_returns_float32_matrix_without_tolist():
+    from types import SimpleNamespace
+
+    import numpy as np
+
+    from src.embeddings import encode_documents
+
+    seen = {}
+
+    def _encode(texts, convert_to_numpy=True, **kwargs):
+        seen["texts"], seen["kwargs"] = texts, kwargs
+        return np.ones((len(texts), 3), dtype=np.float64)
+
+    embeddings = SimpleNamespace(_client=SimpleNamespace(encode=_encode), encode_kwargs={"batch_size": 8})
+    vectors = encode_documents(embeddings, ["a\nb", "c"])
+
+    assert vectors.dtype == np.float32 and vectors.shape == (2, 3)
+    assert vectors.flags["C_CONTIGUOUS"]
+    assert seen == {"texts": ["a b", "c"], "kwargs": {"batch_size": 8}}
+
+
+def test_memo_embeddings_only_embeds_unseen_texts():
+    from src.embeddings import MemoEmbeddings
+
+    class _Base:
+        def __init__(self):
+            self.calls = []
+
+        def embed_documents(self, texts):
+            self.calls.append(list(texts))
+            return [[float(len(t))] for t in texts]
+
+    base = _Base()
+    memo = MemoEmbeddings(base)
+    memo.prime(["a", "bb", "a"])
+    vectors = memo.embed_documents(["bb", "ccc", "a"])
+
+    assert base.calls == [["a", "bb"], ["ccc"]]
+    assert [v.tolist() for v in vectors] == [[2.0], [3.0], [1.0]]
+    memo.clear()
+    assert len(memo) == 0
+
+
+def test_openvino_backend_loads_quantized_ir():
+    from src.embeddings import OPENVINO_QINT8_FILE, _model_kwargs
+
+    kwargs = _model_kwargs("cuda", backend="openvino")
+    assert kwargs["backend"] == "openvino"
+    assert kwargs["model_kwargs"] == {"file_name": OPENVINO_QINT8_FILE}
+
+
+def test_get_embeddings_loads_model_once_until_reset(monkeypatch):
+    import src.embeddings as embeddings
+
+    loads = []
+    monkeypatch.setattr(embeddings, "HuggingFaceEmbeddings", lambda **kwargs: loads.append(kwargs) or object())
+    monkeypatch.setattr(embeddings, "EMBEDDING_TORCH_COMPILE", False)
+    embeddings.reset_embeddings()
+    try:
+        first = embeddings.get_embeddings()
+        assert embeddings.get_embeddings() is first
+        assert len(loads) == 1
+
+        embeddings.reset_embeddings()
+        assert embeddings.get_embeddings() is not first
+        assert len(loads) == 2
+    finally:
+        embeddings.reset_embeddings()
@@ -1,3 +1,5 @@
+from types import SimpleNamespace
+
 from langchain_core.documents import Document
 
 from src.generator import RAGGenerator
@@ -8,6 +10,13 @@ class _FakeLLM:
         return "mocked-answer"
 
 
+class _FakeStreamingLLM:
+    def chat_completion(self, **kwargs):
+        assert kwargs["stream"] is True
+        for piece in ["The duration ", "is 12 months."]:
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+
+
 class _FakeRetriever:
     def __init__(self, docs):
         self._docs = docs
@@ -20,6 +29,8 @@ def _build_generator(docs):
     generator = RAGGenerator.__new__(RAGGenerator)
     generator.llm = _FakeLLM()
     generator.retriever = _FakeRetriever(docs)
+    generator.query_cache = None
+    generator.prompt_cache = None
     return generator
 
 
@@ -43,3 +54,103 @@ def test_answer_question_returns_structured_response():
     assert result["answer"] == "mocked-answer"
     assert len(result["source_documents"]) == 1
     assert result["source_documents"][0]["metadata"]["source"] == "contract.pdf"
+
+
+def test_answer_question_stream_yields_tokens_and_sources():
+    docs = [
+        Document(
+            page_content="The contract duration is 12 months.",
+            metadata={"source": "contract.pdf", "page": 2},
+        )
+    ]
+    generator = _build_generator(docs)
+    generator.llm = _FakeStreamingLLM()
+    result = generator.answer_question_stream("What is the duration?")
+
+    assert result["source_documents"][0]["metadata"]["source"] == "contract.pdf"
+    assert "".join(result["answer_stream"]) == "The duration is 12 months."
+
+
+def test_answer_question_stream_without_context():
+    generator = _build_generator([])
+    result = generator.answer_question_stream("anything")
+    assert result["source_documents"] == []
+    assert "couldn't find relevant information" in "".join(result["answer_stream"])
+
+
+def test_answer_question_is_served_from_query_cache(tmp_path):
+    from src.cache.semantic_cache import SemanticQueryCache
+
+    docs = [Document(page_content="ctx", metadata={"source": "a.pdf", "page": 1})]
+    generator = _build_generator(docs)
+    generator.query_cache = SemanticQueryCache(path=None)
+    generator.embed_question = lambda question: (1.0, 0.0)
+    calls = []
+    generator._generate_text = lambda prompt: calls.append(prompt) or "fresh"
+
+    first = generator.answer_question("What is it?", source_filter=["a.pdf"])
+    second = generator.answer_question("what is it", source_filter=["a.pdf"])
+    assert first["answer"] == second["answer"] == "fresh"
+    assert len(calls) == 1
+
+    generator.llm = _FakeStreamingLLM()
+    cached_stream = generator.answer_question_stream("What is it?", source_filter=["a.pdf"])
+    assert "".join(cached_stream["answer_stream"]) == "fresh"
+
+    streamed = generator.answer_question_stream("Other scope", source_filter=["b.pdf"])
+    assert "".join(streamed["answer_stream"]) == "The duration is 12 months."
+    assert generator.query_cache.lookup((1.0, 0.0), ["b.pdf"])["answer"] == "The duration is 12 months."
+
+
+def test_identical_prompts_are_served_from_prompt_cache():
+    from src.cache.prompt_cache import PromptCache
+
+    class _CountingLLM:
+        calls = 0
+
+        def invoke(self, prompt):
+            _CountingLLM.calls += 1
+            return "generated"
+
+    generator = _build_generator([])
+    generator.llm = _CountingLLM()
+    generator.prompt_cache = PromptCache(path=":memory:")
+
+    assert generator._generate_text("same prompt") == "generated"
+    assert generator._generate_text("same prompt") == "generated"
+    assert _CountingLLM.calls == 1
+
+    generator.llm = _FakeStreamingLLM()
+    assert "".join(generator._stream_text("stream prompt")) == "The duration is 12 months."
+    generator.llm = SimpleNamespace(chat_completion=lambda **kwargs: iter(()))
+    assert "".join(generator._stream_text("stream prompt")) == "The duration is 12 months."
+
+
+def test_failed_generations_are_not_cached():
+    from src.cache.prompt_cache import PromptCache
+    from src.cache.semantic_cache import SemanticQueryCache
+
+    docs = [Document(page_content="ctx", metadata={"source": "a.pdf", "page": 1})]
+    generator = _build_generator(docs)
+    generator.query_cache = SemanticQueryCache(path=None)
+    generator.prompt_cache = PromptCache(path=":memory:")
+    generator.embed_question = lambda question: (1.0, 0.0)
+    generator.llm = SimpleNamespace(chat_completion=lambda **kwargs: SimpleNamespace(choices=[]))
+
+    assert generator.answer_question("What is it?")["answer"] == "I couldn't generate an answer at the moment."
+    generator.llm = SimpleNamespace(chat_completion=lambda **kwargs: iter(()))
+    streamed = generator.answer_question_stream("What is it?")
+    assert "".join(streamed["answer_stream"]) == "I couldn't generate an answer at the moment."
+    assert len(generator.query_cache) == 0 and len(generator.prompt_cache) == 0
+
+    generator.llm = _FakeStreamingLLM()
+    assert "".join(generator.answer_question_stream("What is it?")["answer_stream"]) == "The duration is 12 months."
+
+
+def test_local_llm_endpoint_needs_no_api_key(monkeypatch):
+    import src.generator as generator_module
+
+    monkeypatch.setattr(generator_module, "HUGGINGFACE_API_KEY", "")
+    monkeypatch.setattr(generator_module, "LLM_BASE_URL", "http://localhost:8000")
+    client = RAGGenerator.__new__(RAGGenerator)._initialize_llm()
+    assert client.model == "http://localhost:8000"  # InferenceClient keeps base_url here
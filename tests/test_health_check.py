@@ -0,0 +1,66 @@
+import health_check
+from health_check import CheckResult
+
+
+def _fake_check(name, ok=True):
+    return lambda: CheckResult(name=name, ok=ok, detail="")
+
+
+def test_run_checks_keeps_order_and_repairs_after_gathering(monkeypatch):
+    repaired = []
+    monkeypatch.setattr(health_check, "check_env", _fake_check("Environment"))
+    monkeypatch.setattr(health_check, "check_chroma", _fake_check("ChromaDB", ok=False))
+    monkeypatch.setattr(health_check, "check_huggingface_model_access", _fake_check("Hugging Face Model Access"))
+    monkeypatch.setattr(health_check, "repair_chroma_directory", lambda: repaired.append(True) or "/tmp/backup")
+
+    results = health_check.run_checks(skip_llm=False, repair_chroma=True)
+
+    assert [r.name for r in results] == ["Environment", "ChromaDB", "Hugging Face Model Access"]
+    assert repaired == [True]
+    assert "/tmp/backup" in results[1].detail
+
+
+def test_run_checks_skip_llm_does_not_call_model(monkeypatch):
+    def _unexpected():
+        raise AssertionError("model check should be skipped")
+
+    monkeypatch.setattr(health_check, "check_env", _fake_check("Environment"))
+    monkeypatch.setattr(health_check, "check_chroma", _fake_check("ChromaDB"))
+    monkeypatch.setattr(health_check, "check_huggingface_model_access", _unexpected)
+
+    results = health_check.run_checks(skip_llm=True, repair_chroma=False)
+    assert [r.ok for r in results] == [True, True, True]
+    assert results[2].detail == "Skipped by --skip-llm flag."
+
+
+def test_chroma_probe_releases_the_store_even_when_it_fails(monkeypatch):
+    from types import SimpleNamespace
+
+    events = []
+
+    class _Client:
+        def __init__(self, path):
+            self._system = SimpleNamespace(stop=lambda: events.append("stop"))
+
+        def list_collections(self):
+            raise RuntimeError("database disk image is malformed")
+
+    monkeypatch.setattr(health_check, "PersistentClient", _Client)
+    monkeypatch.setattr(health_check.SharedSystemClient, "clear_system_cache", lambda: events.append("clear"))
+
+    result = health_check.check_chroma()
+    assert not result.ok and "malformed" in result.detail
+    assert events == ["stop", "clear"]
+
+
+def test_failed_repair_is_reported_instead_of_raised(monkeypatch):
+    def _locked():
+        raise PermissionError("file is in use")
+
+    monkeypatch.setattr(health_check, "check_env", _fake_check("Environment"))
+    monkeypatch.setattr(health_check, "check_chroma", _fake_check("ChromaDB", ok=False))
+    monkeypatch.setattr(health_check, "repair_chroma_directory", _locked)
+
+    results = health_check.run_checks(skip_llm=True, repair_chroma=True)
+    assert not results[1].ok
+    assert "Auto-repair failed: file is in use" in results[1].detail
@@ -14,6 +14,14 @@ def test_ingest_documents_source_name_length_mismatch():
         assert "source_names length must match file_paths length" in str(exc)
 
 
+def test_ingest_documents_rejects_non_positive_batch_size():
+    try:
+        ingestion.ingest_documents(["a.pdf"], embedding_batch_size=0)
+        assert False, "Expected ValueError for embedding_batch_size=0"
+    except ValueError as exc:
+        assert "embedding_batch_size must be a positive integer" in str(exc)
+
+
 def test_ingest_documents_partial_failure(monkeypatch):
     class _FakeEmbeddings:
         pass
@@ -21,12 +29,12 @@ def test_ingest_documents_partial_failure(monkeypatch):
     class _FakeVectorStore:
         pass
 
-    def _fake_ingest(file_path, embeddings, vectorstore, source_name=None):
+    def _fake_ingest(file_path, embeddings, vectorstore, source_name=None, content_hash=None, pdf_pool=None):
         if "bad" in file_path:
             raise RuntimeError("boom")
         return {"pages": 2, "chunks": 5}
 
-    monkeypatch.setattr(ingestion, "HuggingFaceEmbeddings", lambda model_name: _FakeEmbeddings())
+    monkeypatch.setattr(ingestion, "get_embeddings", lambda: _FakeEmbeddings())
     monkeypatch.setattr(ingestion, "get_chroma_vectorstore", lambda embeddings, allow_repair=True: _FakeVectorStore())
     monkeypatch.setattr(ingestion, "_ingest_document_with_resources", _fake_ingest)
 
@@ -50,16 +58,222 @@ def test_clear_vectorstore_deletes_all_ids(monkeypatch):
         def __init__(self):
             self.deleted = None
 
-        def get(self):
+        def get(self, include=None):
+            assert include == []
             return {"ids": ["1", "2", "3"]}
 
         def delete(self, ids=None):
             self.deleted = ids
 
     fake_vs = _FakeVectorStore()
-    monkeypatch.setattr(ingestion, "HuggingFaceEmbeddings", lambda model_name: _FakeEmbeddings())
+    monkeypatch.setattr(ingestion, "get_embeddings", lambda: _FakeEmbeddings())
     monkeypatch.setattr(ingestion, "get_chroma_vectorstore", lambda embeddings, allow_repair=True: fake_vs)
 
     deleted = ingestion.clear_vectorstore()
     assert deleted == 3
     assert fake_vs.deleted == ["1", "2", "3"]
+
+
+def test_write_chunks_upserts_precomputed_vectors_in_slices(monkeypatch):
+    from langchain_core.documents import Document
+
+    class _FakeEmbeddings:
+        def __init__(self):
+            self.calls = []
+
+        def embed_documents(self, texts):
+            self.calls.append(list(texts))
+            return [[float(i)] for i in range(len(texts))]
+
+    class _FakeCollection:
+        def __init__(self):
+            self.batches = []
+
+        def upsert(self, ids, embeddings, metadatas, documents):
+            self.batches.append((ids, embeddings, metadatas, documents))
+
+    fake_vs = type("_FakeVectorStore", (), {})()
+    fake_vs._collection = _FakeCollection()
+    embeddings = _FakeEmbeddings()
+    chunks = [Document(page_content=f"c{i}", metadata={"page": 1}) for i in range(5)]
+    monkeypatch.setattr(ingestion, "UPSERT_BATCH_SIZE", 2)
+
+    texts, vectors = ingestion._embed_chunks(embeddings, chunks)
+    ingestion._write_chunks(fake_vs, chunks, [f"id{i}" for i in range(5)], texts, vectors)
+
+    assert embeddings.calls == [["c0", "c1", "c2", "c3", "c4"]]
+    assert [b[0] for b in fake_vs._collection.batches] == [["id0", "id1"], ["id2", "id3"], ["id4"]]
+    assert vectors.dtype == "float32" and vectors.shape == (5, 1)
+    assert fake_vs._collection.batches[2][1].tolist() == [[4.0]]
+
+
+def test_ingest_streams_chunks_in_batches(tmp_path, monkeypatch):
+    from langchain_core.documents import Document
+
+    pdf_path = tmp_path / "doc.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4")
+    pages = [Document(page_content=f"p{i}", metadata={"page": i}) for i in (1, 2, 3)]
+    batches = []
+    events = []
+
+    class _FakeVectorStore:
+        def get(self, where=None, include=None):
+            events.append(("get", where))
+            return {"ids": []}
+
+    monkeypatch.setattr(ingestion, "iter_pdf_pages", lambda path, source_name=None, pdf_pool=None: iter(pages))
+    monkeypatch.setattr(ingestion, "iter_semantic_chunks", lambda pages, embeddings: iter(pages))
+    monkeypatch.setattr(ingestion, "UPSERT_BATCH_SIZE", 2)
+    monkeypatch.setattr(ingestion, "_embed_chunks", lambda emb, batch: ([], []))
+    monkeypatch.setattr(
+        ingestion,
+        "_write_chunks",
+        lambda vs, batch, ids, texts, vectors: (events.append("upsert"), batches.append(ids)),
+    )
+
+    stats = ingestion._ingest_document_with_resources(str(pdf_path), None, _FakeVectorStore())
+
+    assert stats == {"pages": 3, "chunks": 3}
+    assert events == [("get", {"source": "doc.pdf"}), "upsert", "upsert"]
+    assert batches == [
+        [ingestion._chunk_id("doc.pdf", 1, "p1"), ingestion._chunk_id("doc.pdf", 2, "p2")],
+        [ingestion._chunk_id("doc.pdf", 3, "p3")],
+    ]
+
+
+def test_reingest_embeds_only_changed_chunks_and_drops_stale_ones(tmp_path, monkeypatch):
+    from langchain_core.documents import Document
+
+    pdf_path = tmp_path / "doc.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4")
+    kept = ingestion._chunk_id("doc.pdf", 1, "same")
+    stale = ingestion._chunk_id("doc.pdf", 2, "old")
+    pages = [
+        Document(page_content="same", metadata={"page": 1}),
+        Document(page_content="new", metadata={"page": 2}),
+        Document(page_content="new", metadata={"page": 2}),
+    ]
+    embedded = []
+
+    class _FakeCollection:
+        def __init__(self):
+            self.upserted, self.updated = [], []
+
+        def upsert(self, ids, embeddings, metadatas, documents):
+            self.upserted.extend(ids)
+
+        def update(self, ids, metadatas):
+            self.updated.extend(ids)
+
+    class _FakeVectorStore:
+        def __init__(self):
+            self._collection = _FakeCollection()
+            self.deleted = None
+
+        def get(self, where=None, include=None):
+            return {"ids": [kept, stale]}
+
+        def delete(self, ids=None):
+            self.deleted = ids
+
+    fake_vs = _FakeVectorStore()
+    monkeypatch.setattr(ingestion, "iter_pdf_pages", lambda path, source_name=None, pdf_pool=None: iter(pages))
+    monkeypatch.setattr(ingestion, "iter_semantic_chunks", lambda pages, embeddings: iter(pages))
+    monkeypatch.setattr(
+        ingestion,
+        "_embed_chunks",
+        lambda emb, batch: (embedded.extend(c.page_content for c in batch), ([], [[0.0]] * len(batch)))[1],
+    )
+
+    stats = ingestion._ingest_document_with_resources(str(pdf_path), None, fake_vs, content_hash="v2")
+
+    assert stats == {"pages": 2, "chunks": 2}
+    assert embedded == ["new"]
+    assert fake_vs._collection.upserted == [ingestion._chunk_id("doc.pdf", 2, "new")]
+    assert fake_vs._collection.updated == [kept]
+    assert fake_vs.deleted == [stale]
+    assert pages[0].metadata["content_hash"] == "v2"
+
+
+def test_token_cap_splitter_respects_model_max_sequence_length():
+    from types import SimpleNamespace
+
+    from langchain_core.documents import Document
+
+    # Two special tokens ([CLS]/[SEP]) share the model's 6-token window with the text.
+    tokenizer = SimpleNamespace(tokenize=str.split, num_special_tokens_to_add=lambda: 2)
+    embeddings = SimpleNamespace(_client=SimpleNamespace(tokenizer=tokenizer, max_seq_length=6))
+    splitter = ingestion._token_cap_splitter(embeddings)
+
+    chunks = splitter.split_documents([Document(page_content="a b c d e f g h i j", metadata={"page": 1})])
+    assert len(chunks) > 1
+    assert all(len(chunk.page_content.split()) <= 4 for chunk in chunks)
+    assert max(len(chunk.page_content.split()) for chunk in chunks) == 4
+    assert all(chunk.metadata["page"] == 1 for chunk in chunks)
+    assert ingestion._token_cap_splitter(object()) is None
+
+
+def test_find_indexed_sources_queries_content_hash_metadata(monkeypatch):
+    class _FakeVectorStore:
+        def __init__(self):
+            self.queries = []
+
+        def get(self, where=None, limit=None, include=None):
+            self.queries.append(where)
+            if where == {"content_hash": "known"}:
+                return {"ids": ["a.pdf:1:0"], "metadatas": [{"source": "a.pdf"}]}
+            return {"ids": [], "metadatas": []}
+
+    fake_vs = _FakeVectorStore()
+    monkeypatch.setattr(ingestion, "get_embeddings", lambda: object())
+    monkeypatch.setattr(ingestion, "get_chroma_vectorstore", lambda embeddings, allow_repair=True: fake_vs)
+
+    assert ingestion.find_indexed_sources(["known", "new", "known"]) == {"known": "a.pdf"}
+    assert fake_vs.queries == [{"content_hash": "known"}, {"content_hash": "new"}]
+    assert ingestion.find_indexed_sources([]) == {}
+
+
+def test_prefetch_preserves_order_and_reraises_producer_errors():
+    assert list(ingestion._prefetch(iter(range(10)), maxsize=2)) == list(range(10))
+
+    def _broken():
+        yield 1
+        raise RuntimeError("parse failed")
+
+    consumed = []
+    try:
+        for item in ingestion._prefetch(_broken()):
+            consumed.append(item)
+        assert False, "Expected the producer error to propagate"
+    except RuntimeError as exc:
+        assert "parse failed" in str(exc)
+    assert consumed == [1]
+
+
+def test_semantic_chunker_embeds_page_group_in_one_batch(monkeypatch):
+    from langchain_core.documents import Document
+
+    class _CountingEmbeddings:
+        def __init__(self):
+            self.calls = []
+
+        def embed_documents(self, texts):
+            self.calls.append(list(texts))
+            return [[float(len(t)), 1.0] for t in texts]
+
+        def embed_query(self, text):
+            return [1.0, 1.0]
+
+    base = _CountingEmbeddings()
+    pages = [
+        Document(page_content="One. Two is here. Three!", metadata={"page": 1}),
+        Document(page_content="Four? Five is longer. Six.", metadata={"page": 2}),
+        Document(page_content="Single sentence page", metadata={"page": 3}),
+    ]
+
+    chunks = list(ingestion.iter_semantic_chunks(pages, base))
+
+    assert len(base.calls) == 1
+    assert len(base.calls[0]) == 6
+    assert {c.metadata["page"] for c in chunks} == {1, 2, 3}
+    assert "".join(c.page_content for c in chunks if c.metadata["page"] == 3) == "Single sentence page"
@@ -0,0 +1,79 @@
+import src.pdf_extract as pdf_extract
+
+
+def _write_pdf(path, page_texts):
+    """Minimal uncompressed PDF with one line of Helvetica text per page."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in page_texts:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    path.write_bytes(bytes(out))
+
+
+def test_small_pdf_is_parsed_serially(tmp_path):
+    pdf_path = tmp_path / "small.pdf"
+    _write_pdf(pdf_path, ["alpha", "beta"])
+    assert list(pdf_extract.iter_page_texts(str(pdf_path))) == [(1, "alpha"), (2, "beta")]
+
+
+def test_large_pdf_pages_keep_order_across_worker_processes(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_extract, "PAGES_PER_TASK", 3)
+    monkeypatch.setattr(pdf_extract.os, "cpu_count", lambda: 2)
+    pdf_path = tmp_path / "large.pdf"
+    texts = [f"page{i}" for i in range(1, 11)]
+    _write_pdf(pdf_path, texts)
+
+    rows = list(pdf_extract.iter_page_texts(str(pdf_path)))
+    assert rows == list(enumerate(texts, start=1))
+
+
+def test_single_page_range_never_starts_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_extract, "PAGES_PER_TASK", 3)
+    monkeypatch.setattr(pdf_extract.os, "cpu_count", lambda: 2)
+    monkeypatch.setattr(pdf_extract, "ProcessPoolExecutor", None)  # Any pool start would fail
+    pdf_path = tmp_path / "short.pdf"
+    _write_pdf(pdf_path, ["one", "two", "three"])
+
+    with pdf_extract.PagePool() as pool:
+        assert list(pdf_extract.iter_page_texts(str(pdf_path), pool)) == [(1, "one"), (2, "two"), (3, "three")]
+
+
+def test_batch_reuses_one_worker_pool(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_extract, "PAGES_PER_TASK", 2)
+    monkeypatch.setattr(pdf_extract.os, "cpu_count", lambda: 2)
+    paths = []
+    for name in ("a", "b"):
+        paths.append(tmp_path / f"{name}.pdf")
+        _write_pdf(paths[-1], [f"{name}{i}" for i in range(1, 5)])
+
+    with pdf_extract.PagePool(max_workers=2) as pool:
+        first = list(pdf_extract.iter_page_texts(str(paths[0]), pool))
+        executor = pool._executor
+        second = list(pdf_extract.iter_page_texts(str(paths[1]), pool))
+        assert pool._executor is executor
+    assert pool._executor is None
+    assert [text for _, text in first + second] == ["a1", "a2", "a3", "a4", "b1", "b2", "b3", "b4"]
+
+
+def test_prefetch_files_skips_missing_paths(tmp_path):
+    pdf_path = tmp_path / "doc.pdf"
+    _write_pdf(pdf_path, ["alpha"])
+    pdf_extract.prefetch_files([str(tmp_path / "missing.pdf"), str(pdf_path)])
+    assert list(pdf_extract.iter_page_texts(str(pdf_path))) == [(1, "alpha")]
@@ -0,0 +1,29 @@
+import src.cache.prompt_cache as prompt_cache
+from src.cache.prompt_cache import PromptCache, prompt_key
+
+
+def test_prompt_key_depends_on_model():
+    assert prompt_key("p", model="a") != prompt_key("p", model="b")
+    assert prompt_key("p", model="a") == prompt_key("p", model="a")
+
+
+def test_entries_persist_expire_and_evict(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(prompt_cache.time, "time", lambda: now[0])
+    path = str(tmp_path / "cache" / "prompts.db")
+
+    cache = PromptCache(path=path, max_size=2, ttl_seconds=60)
+    cache.set("a", "A")
+    now[0] += 1
+    cache.set("b", "B")
+    now[0] += 1
+    assert cache.get("a") == "A"
+    now[0] += 1
+    cache.set("c", "C")
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert PromptCache(path=path).get("c") == "C"
+
+    now[0] += 61
+    assert cache.get("a") is None
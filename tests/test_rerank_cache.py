@@ -0,0 +1,49 @@
+import src.cache.rerank_cache as rerank_cache
+from src.cache.rerank_cache import RerankScoreCache
+
+
+def test_scores_persist_per_model_and_expire(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rerank_cache.time, "time", lambda: now[0])
+    path = str(tmp_path / "cache" / "rerank.db")
+
+    cache = RerankScoreCache(path=path, ttl_seconds=60, model="m1")
+    cache.set_many("q", ["a", "b"], [0.5, -1.0])
+
+    assert cache.get_many("q", ["b", "x", "a", "b"]) == [-1.0, None, 0.5, -1.0]
+    assert RerankScoreCache(path=path, model="m1").get_many("q", ["a"]) == [0.5]
+    assert RerankScoreCache(path=path, model="m2").get_many("q", ["a"]) == [None]
+
+    now[0] += 61
+    assert cache.get_many("q", ["a"]) == [None]
+
+
+def test_oldest_scores_are_evicted(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rerank_cache.time, "time", lambda: now[0])
+    cache = RerankScoreCache(path=":memory:", max_size=2, ttl_seconds=60)
+    for text in ("a", "b", "c"):
+        cache.set_many("q", [text], [1.0])
+        now[0] += 1
+
+    assert len(cache) == 2
+    assert cache.get_many("q", ["a", "c"]) == [None, 1.0]
+
+
+def test_eviction_waits_for_slack_and_uses_the_created_index(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rerank_cache.time, "time", lambda: now[0])
+    cache = RerankScoreCache(path=":memory:", max_size=10, ttl_seconds=600)
+    for i in range(11):
+        cache.set_many("q", [f"t{i}"], [1.0])
+        now[0] += 1
+    assert len(cache) == 11  # Within the slack: no eviction pass yet
+
+    cache.set_many("q", ["t11"], [1.0])
+    assert len(cache) == 10
+    assert cache.get_many("q", ["t1", "t2", "t11"]) == [None, 1.0, 1.0]
+
+    plan = cache._conn.execute(
+        "EXPLAIN QUERY PLAN SELECT rowid FROM scores ORDER BY created LIMIT 1"
+    ).fetchall()
+    assert any("scores_created" in row[-1] for row in plan)
@@ -56,3 +56,445 @@ def test_advanced_retriever_source_filter_applies():
     filtered = retriever._filter_by_sources(docs, ["new.pdf"])
     assert len(filtered) == 1
     assert filtered[0].metadata["source"] == "new.pdf"
+
+
+def test_warm_up_runs_embedder_and_cross_encoder_once():
+    calls = []
+
+    class _Embeddings:
+        def embed_query(self, text):
+            calls.append(("embed", text))
+            return [0.0]
+
+    class _CrossEncoder:
+        def score(self, pairs):
+            calls.append(("score", list(pairs)))
+            return [0.0]
+
+    retriever = AdvancedRetriever.__new__(AdvancedRetriever)
+    retriever.embeddings = _Embeddings()
+    retriever.cross_encoder = _CrossEncoder()
+    retriever.warm_up()
+
+    assert calls == [("embed", "warmup"), ("score", [("warmup", "warmup")])]
+
+
+def test_ensemble_runs_sub_retrievers_concurrently():
+    import asyncio
+    import threading
+
+    from langchain_core.retrievers import BaseRetriever
+
+    from src.retrieval import SimpleEnsembleRetriever
+
+    barrier = threading.Barrier(2, timeout=5)
+
+    class _BarrierRetriever(BaseRetriever):
+        texts: list
+
+        def _get_relevant_documents(self, query, *, run_manager):
+            barrier.wait()  # Only passes if both retrievers are running at the same time.
+            return [Document(page_content=t, metadata={}) for t in self.texts]
+
+    ensemble = SimpleEnsembleRetriever(
+        retrievers=[_BarrierRetriever(texts=["a", "b"]), _BarrierRetriever(texts=["b", "c"])]
+    )
+    assert [d.page_content for d in ensemble.invoke("q")] == ["b", "a", "c"]
+    assert [d.page_content for d in asyncio.run(ensemble.ainvoke("q"))] == ["b", "a", "c"]
+
+
+def test_reranker_scores_in_batches():
+    class _RecordingModel:
+        def __init__(self):
+            self.batch_sizes = []
+
+        def score(self, pairs):
+            self.batch_sizes.append(len(pairs))
+            return [float(len(doc)) for _, doc in pairs]
+
+    model = _RecordingModel()
+    docs = [Document(page_content="x" * n, metadata={}) for n in (1, 5, 3, 4, 2)]
+    top_docs = SafeCrossEncoderReranker(model=model, top_n=2, batch_size=2).compress_documents(docs, "q")
+
+    assert model.batch_sizes == [2, 2, 1]
+    assert [d.page_content for d in top_docs] == ["xxxxx", "xxxx"]
+
+
+def test_reranker_only_scores_pairs_missing_from_cache():
+    from src.cache.rerank_cache import RerankScoreCache
+
+    class _RecordingModel:
+        def __init__(self):
+            self.scored = []
+
+        def score(self, pairs):
+            self.scored.extend(doc for _, doc in pairs)
+            return [float(len(doc)) for _, doc in pairs]
+
+    model = _RecordingModel()
+    cache = RerankScoreCache(path=":memory:")
+    cache.set_many("q", ["cached"], [100.0])
+    reranker = SafeCrossEncoderReranker(model=model, top_n=2, cache=cache)
+
+    docs = [Document(page_content=t, metadata={}) for t in ("a", "cached", "bb")]
+    top_docs = reranker.compress_documents(docs, "q")
+    assert model.scored == ["a", "bb"]
+    assert [d.page_content for d in top_docs] == ["cached", "bb"]
+
+    reranker.compress_documents(docs, "q")
+    assert model.scored == ["a", "bb"]
+
+
+def test_literal_queries_keep_the_keyword_ranking():
+    from langchain_core.retrievers import BaseRetriever
+
+    from src.retrieval import HYBRID_WEIGHTS, SafeContextualCompressionRetriever, SimpleEnsembleRetriever
+
+    class _ExplodingModel:
+        def score(self, pairs):
+            raise AssertionError("cross-encoder should not run")
+
+    class _Fixed(BaseRetriever):
+        texts: list
+
+        def _get_relevant_documents(self, query, *, run_manager):
+            return [Document(page_content=t, metadata={"source": "a.pdf"}) for t in self.texts]
+
+    keyword = _Fixed(texts=["SKU-1234 spec", "k2"])
+    dense = _Fixed(texts=["d1", "d2", "d3"])
+    retriever = SafeContextualCompressionRetriever(
+        base_compressor=SafeCrossEncoderReranker(model=_ExplodingModel(), top_n=2),
+        base_retriever=SimpleEnsembleRetriever(retrievers=[keyword, dense], weights=HYBRID_WEIGHTS),
+        literal_retriever=keyword,
+    )
+    for query in ('"termination clause"', "report.pdf", "  SKU-1234 "):
+        assert [d.page_content for d in retriever.invoke(query)] == ["SKU-1234 spec", "k2"]
+
+    # When source filtering removed every keyword hit, the dense candidates are reranked.
+    retriever.base_compressor.model = _ModelWithScore()
+    dense_only = [d for d in retriever.base_retriever.invoke("x") if d.page_content.startswith("d")]
+    assert [d.page_content for d in retriever.rerank("SKU-1234", dense_only)] == ["d2", "d3"]
+
+
+def test_ensemble_fusion_honours_weights():
+    from src.retrieval import SimpleEnsembleRetriever
+
+    keyword = [Document(page_content=t, metadata={}) for t in ("k1", "shared")]
+    dense = [Document(page_content=t, metadata={}) for t in ("d1", "d2", "shared")]
+    ensemble = SimpleEnsembleRetriever(retrievers=[], weights=[0.3, 0.7])
+
+    fused = ensemble._merge([keyword, dense])
+    assert [d.page_content for d in fused] == ["shared", "d1", "d2", "k1"]
+    assert fused[0].metadata["retriever_source"] == "retriever_1"
+    assert [d.page_content for d in ensemble.model_copy(update={"weights": None})._merge([keyword, dense])][-1] == "d2"
+
+
+def test_bm25_index_is_paged_in_and_reused_until_the_corpus_changes(tmp_path, monkeypatch):
+    from langchain_core.retrievers import BaseRetriever
+
+    import src.retrieval as retrieval
+
+    class _EmptyRetriever(BaseRetriever):
+        def _get_relevant_documents(self, query, *, run_manager):
+            return []
+
+    class _FakeVectorStore:
+        def __init__(self, ids):
+            self.ids = ids
+            self.full_loads = 0
+
+        def get(self, include=None, limit=None, offset=0):
+            if include == []:
+                return {"ids": self.ids}
+            assert include == ["documents", "metadatas"]
+            self.full_loads += offset == 0
+            ids = self.ids[offset:offset + limit]
+            return {"ids": ids, "documents": [f"text {i}" for i in ids], "metadatas": [None] * len(ids)}
+
+        def as_retriever(self, search_kwargs=None):
+            return _EmptyRetriever()
+
+    monkeypatch.setattr(retrieval, "CHROMA_PERSIST_DIRECTORY", str(tmp_path))
+    monkeypatch.setattr(retrieval, "CORPUS_PAGE_SIZE", 2)
+    monkeypatch.setattr(retrieval, "get_cross_encoder", lambda: _ModelWithScore())
+
+    def _build(vectorstore):
+        retriever = AdvancedRetriever.__new__(AdvancedRetriever)
+        retriever.vectorstore = vectorstore
+        retriever._initialize_retrievers()
+        return retriever
+
+    (tmp_path / "bm25.pkl").write_bytes(b"old format")
+    store = _FakeVectorStore(["a", "b"])
+    _build(store)
+    cached = _build(store)
+    assert store.full_loads == 1
+    assert [d.page_content for d in cached.base_retriever.retrievers[0].docs] == ["text a", "text b"]
+    assert not (tmp_path / "bm25.pkl").exists()
+
+    # The live index stays mapped while a new version is written beside it.
+    store.ids = ["a", "b", "c"]
+    rebuilt = _build(store)
+    assert store.full_loads == 2
+    assert len(rebuilt.base_retriever.retrievers[0].docs) == 3
+    assert [d.page_content for d in cached.base_retriever.retrievers[0].docs] == ["text a", "text b"]
+    assert sorted(p.name for p in (tmp_path / "bm25").iterdir() if p.is_dir()) == [
+        (tmp_path / "bm25" / "CURRENT").read_text().split("\n")[0]
+    ]
+
+
+def test_source_filter_applies_before_reranking():
+    from src.retrieval import SafeContextualCompressionRetriever
+
+    class _RecordingModel:
+        def __init__(self):
+            self.scored = []
+
+        def score(self, pairs):
+            self.scored.extend(doc for _, doc in pairs)
+            return [1.0] * len(pairs)
+
+    docs = [
+        Document(page_content="old-1", metadata={"source": "old.pdf"}),
+        Document(page_content="new-1", metadata={"source": "new.pdf"}),
+        Document(page_content="old-2", metadata={"source": "old.pdf"}),
+        Document(page_content="new-2", metadata={"source": "new.pdf"}),
+    ]
+    model = _RecordingModel()
+    retriever = AdvancedRetriever.__new__(AdvancedRetriever)
+    retriever.base_retriever = _FallbackRetriever(docs)
+    retriever.retrieve_chain = SafeContextualCompressionRetriever(
+        base_compressor=SafeCrossEncoderReranker(model=model, top_n=2),
+        base_retriever=retriever.base_retriever,
+    )
+
+    result = retriever.get_relevant_documents("what changed this year", source_filter=["new.pdf"])
+    assert model.scored == ["new-1", "new-2"]
+    assert [d.page_content for d in result] == ["new-1", "new-2"]
+
+
+def test_cross_encoder_onnx_backend_runs_quantized_on_cpu():
+    from src.retrieval import _cross_encoder_kwargs
+
+    kwargs = _cross_encoder_kwargs("onnx")
+    assert kwargs["device"] == "cpu" and kwargs["backend"] == "onnx"
+    assert kwargs["model_kwargs"]["provider"] == "CPUExecutionProvider"
+    assert "backend" not in _cross_encoder_kwargs("torch")
+
+
+def test_cross_encoder_uses_half_precision_on_cuda(monkeypatch):
+    import src.retrieval as retrieval
+
+    monkeypatch.setattr(retrieval, "resolve_device", lambda: "cuda")
+    assert retrieval._cross_encoder_kwargs("torch") == {
+        "device": "cuda",
+        "model_kwargs": {"attn_implementation": "sdpa", "torch_dtype": "float16"},
+    }
+
+
+def test_cascade_reranks_only_the_best_fused_candidates():
+    from src.retrieval import SafeContextualCompressionRetriever
+
+    class _RecordingModel:
+        def __init__(self):
+            self.scored = []
+
+        def score(self, pairs):
+            self.scored.extend(doc for _, doc in pairs)
+            return [float(i) for i in range(len(pairs))]
+
+    model = _RecordingModel()
+    docs = [Document(page_content=f"d{i}", metadata={}) for i in range(5)]
+    retriever = SafeContextualCompressionRetriever(
+        base_compressor=SafeCrossEncoderReranker(model=model, top_n=2),
+        base_retriever=_FallbackRetriever(docs),
+        max_candidates=3,
+    )
+
+    assert [d.page_content for d in retriever.invoke("which clause applies")] == ["d2", "d1"]
+    assert model.scored == ["d0", "d1", "d2"]
+
+
+def test_cross_encoder_is_loaded_once_until_reset(monkeypatch):
+    import src.retrieval as retrieval
+
+    loads = []
+    monkeypatch.setattr(
+        retrieval, "HuggingFaceCrossEncoder", lambda model_name, model_kwargs: loads.append(model_name) or object()
+    )
+    retrieval.reset_cross_encoder()
+    try:
+        first = retrieval.get_cross_encoder()
+        assert retrieval.get_cross_encoder() is first and len(loads) == 1
+        retrieval.reset_cross_encoder()
+        assert retrieval.get_cross_encoder() is not first and len(loads) == 2
+    finally:
+        retrieval.reset_cross_encoder()
+
+
+def test_aget_batch_bounds_concurrency_and_keeps_order():
+    import asyncio
+    import threading
+    import time
+
+    from langchain_core.retrievers import BaseRetriever
+
+    from src.bm25 import NumpyBM25Retriever
+    from src.retrieval import HYBRID_WEIGHTS, SafeContextualCompressionRetriever, SimpleEnsembleRetriever
+
+    queries = [f"clause {i}" for i in range(6)]
+    corpus = [Document(page_content=f"clause {i} text", metadata={"source": "a.pdf"}) for i in range(6)]
+    state = {"in_flight": 0, "peak": 0, "embed_calls": 0}
+    lock = threading.Lock()
+
+    class _Embeddings:
+        def embed_documents(self, texts):
+            state["embed_calls"] += 1
+            return [[float(i)] for i in range(len(texts))]
+
+    class _VectorStore:
+        def similarity_search_by_vector(self, vector, k):
+            return [corpus[int(vector[0])]]
+
+    class _SlowModel:
+        def score(self, pairs):
+            with lock:
+                state["in_flight"] += 1
+                state["peak"] = max(state["peak"], state["in_flight"])
+            time.sleep(0.02)
+            with lock:
+                state["in_flight"] -= 1
+            return [1.0] * len(pairs)
+
+    class _Unused(BaseRetriever):
+        def _get_relevant_documents(self, query, *, run_manager):
+            raise AssertionError("the batched path should not fall back to per-query retrieval")
+
+    retriever = AdvancedRetriever.__new__(AdvancedRetriever)
+    retriever.embeddings = _Embeddings()
+    retriever.vectorstore = _VectorStore()
+    retriever.bm25_retriever = NumpyBM25Retriever.from_documents(corpus, k=1)
+    retriever.base_retriever = SimpleEnsembleRetriever(
+        retrievers=[retriever.bm25_retriever, _Unused()], weights=HYBRID_WEIGHTS
+    )
+    retriever.retrieve_chain = SafeContextualCompressionRetriever(
+        base_compressor=SafeCrossEncoderReranker(model=_SlowModel(), top_n=1),
+        base_retriever=retriever.base_retriever,
+    )
+
+    results = asyncio.run(retriever.aget_batch(queries, concurrency=2))
+    assert [[d.page_content for d in docs] for docs in results] == [[f"{q} text"] for q in queries]
+    assert state["embed_calls"] == 1
+    assert state["peak"] == 2
+
+
+def test_aget_batch_embeds_and_bm25_scores_all_queries_at_once():
+    import asyncio
+
+    from langchain_core.retrievers import BaseRetriever
+
+    from src.bm25 import NumpyBM25Retriever
+    from src.retrieval import SafeContextualCompressionRetriever, SimpleEnsembleRetriever
+
+    corpus = [Document(page_content=t, metadata={"source": "a.pdf"}) for t in ("notice period", "payment terms")]
+    calls = {"embed": [], "dense": 0}
+
+    class _Embeddings:
+        def embed_documents(self, texts):
+            calls["embed"].append(list(texts))
+            return [[float(i)] for i in range(len(texts))]
+
+    class _VectorStore:
+        def similarity_search_by_vector(self, vector, k):
+            calls["dense"] += 1
+            return [corpus[int(vector[0]) % 2]]
+
+    class _Unused(BaseRetriever):
+        def _get_relevant_documents(self, query, *, run_manager):
+            raise AssertionError("per-query dense retrieval should not run")
+
+    retriever = AdvancedRetriever.__new__(AdvancedRetriever)
+    retriever.embeddings = _Embeddings()
+    retriever.vectorstore = _VectorStore()
+    retriever.bm25_retriever = NumpyBM25Retriever.from_documents(corpus, k=2)
+    retriever.base_retriever = SimpleEnsembleRetriever(
+        retrievers=[retriever.bm25_retriever, _Unused()], weights=[0.3, 0.7]
+    )
+    retriever.retrieve_chain = SafeContextualCompressionRetriever(
+        base_compressor=SafeCrossEncoderReranker(model=_ModelWithScore(), top_n=1),
+        base_retriever=retriever.base_retriever,
+    )
+
+    results = asyncio.run(retriever.aget_batch(["notice", "payment"]))
+    assert calls == {"embed": [["notice", "payment"]], "dense": 2}
+    assert [[d.page_content for d in docs] for docs in results] == [["notice period"], ["payment terms"]]
+
+
+def test_ensemble_merges_chunks_that_differ_only_in_whitespace_or_case():
+    from src.retrieval import SimpleEnsembleRetriever
+
+    keyword = [Document(page_content="Notice  period:\n30 days", metadata={})]
+    dense = [Document(page_content="notice period: 30 days", metadata={}), Document(page_content="other", metadata={})]
+    fused = SimpleEnsembleRetriever(retrievers=[])._merge([keyword, dense])
+    assert [d.page_content for d in fused] == ["Notice  period:\n30 days", "other"]
+
+
+def test_hybrid_weights_interleave_disjoint_keyword_and_dense_hits():
+    from src.retrieval import HYBRID_WEIGHTS, SimpleEnsembleRetriever
+
+    keyword = [Document(page_content=f"k{i}", metadata={}) for i in range(1, 11)]
+    dense = [Document(page_content=f"d{i}", metadata={}) for i in range(1, 11)]
+    fused = SimpleEnsembleRetriever(retrievers=[], weights=HYBRID_WEIGHTS)._merge([keyword, dense])
+    assert [d.page_content for d in fused[:4]] == ["k1", "d1", "k2", "d2"]
+
+
+def test_default_cascade_keeps_top_keyword_hits_and_scores_only_m_pairs():
+    from langchain_core.retrievers import BaseRetriever
+
+    from src.config import RERANK_CANDIDATES, TOP_K
+    from src.retrieval import HYBRID_WEIGHTS, SafeContextualCompressionRetriever, SimpleEnsembleRetriever
+
+    class _Fixed(BaseRetriever):
+        texts: list
+
+        def _get_relevant_documents(self, query, *, run_manager):
+            return [Document(page_content=t, metadata={}) for t in self.texts]
+
+    class _PrefersKeywordHit:
+        def __init__(self):
+            self.scored = []
+
+        def score(self, pairs):
+            self.scored.extend(doc for _, doc in pairs)
+            return [1.0 if doc == "k1" else 0.0 for _, doc in pairs]
+
+    model = _PrefersKeywordHit()
+    keyword = _Fixed(texts=[f"k{i}" for i in range(1, TOP_K + 1)])
+    dense = _Fixed(texts=[f"d{i}" for i in range(1, TOP_K + 1)])
+    retriever = SafeContextualCompressionRetriever(
+        base_compressor=SafeCrossEncoderReranker(model=model, top_n=1),
+        base_retriever=SimpleEnsembleRetriever(retrievers=[keyword, dense], weights=HYBRID_WEIGHTS),
+        max_candidates=RERANK_CANDIDATES,
+    )
+
+    assert RERANK_CANDIDATES < 2 * TOP_K
+    assert [d.page_content for d in retriever.invoke("which clause applies")] == ["k1"]
+    assert len(model.scored) == RERANK_CANDIDATES
+    # Interleaved fusion: the cut keeps the best hits of both retrievers.
+    assert {f"k{i}" for i in range(1, RERANK_CANDIDATES // 2 + 1)} <= set(model.scored)
+    assert {f"d{i}" for i in range(1, RERANK_CANDIDATES // 2 + 1)} <= set(model.scored)
+
+
+def test_unreadable_score_cache_falls_back_to_the_model():
+    import sqlite3
+
+    class _LockedCache:
+        def get_many(self, query, texts):
+            raise sqlite3.OperationalError("database is locked")
+
+        def set_many(self, query, texts, scores):
+            raise sqlite3.OperationalError("database is locked")
+
+    docs = [Document(page_content=t, metadata={}) for t in ("doc-a", "doc-b", "doc-c")]
+    reranker = SafeCrossEncoderReranker(model=_ModelWithScore(), top_n=2, cache=_LockedCache())
+    assert [d.page_content for d in reranker.compress_documents(docs, "q")] == ["doc-b", "doc-c"]
@@ -0,0 +1,91 @@
+import src.cache.semantic_cache as semantic_cache
+from src.cache.semantic_cache import SemanticQueryCache, normalize_question, source_filter_key
+
+
+def _result(answer):
+    return {
+        "answer": answer,
+        "source_documents": [{"page_content": "ctx", "metadata": {"source": "a.pdf", "page": 1}}],
+    }
+
+
+def test_lookup_hits_similar_query_in_same_scope(tmp_path):
+    cache = SemanticQueryCache(path=str(tmp_path / "q.db"), threshold=0.9)
+    cache.add([1.0, 0.0, 0.0], ["a.pdf"], _result("cached"))
+
+    hit = cache.lookup([0.99, 0.05, 0.0], ["a.pdf"])
+    assert hit is not None
+    assert hit["answer"] == "cached"
+    assert cache.lookup([0.0, 1.0, 0.0], ["a.pdf"]) is None
+    assert cache.lookup([1.0, 0.0, 0.0], ["b.pdf"]) is None
+
+
+def test_source_filter_key_is_order_insensitive():
+    assert source_filter_key(["b.pdf", "a.pdf"]) == source_filter_key(["a.pdf", "b.pdf"])
+    assert source_filter_key(None) == source_filter_key([]) == ""
+
+
+def test_normalize_question_collapses_case_whitespace_and_punctuation():
+    assert normalize_question("  What is   X?? ") == "what is x"
+    assert normalize_question("what is x") == normalize_question("WHAT\tis X.")
+
+
+def test_entries_expire_after_ttl(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(semantic_cache.time, "time", lambda: now[0])
+    cache = SemanticQueryCache(path=None, ttl_seconds=60)
+    cache.add([1.0, 0.0], None, _result("old"))
+
+    now[0] += 61
+    assert cache.lookup([1.0, 0.0], None) is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(semantic_cache.time, "time", lambda: now[0])
+    cache = SemanticQueryCache(path=None, max_size=2)
+    cache.add([1.0, 0.0, 0.0], None, _result("a"))
+    now[0] += 1
+    cache.add([0.0, 1.0, 0.0], None, _result("b"))
+    now[0] += 1
+    assert cache.lookup([1.0, 0.0, 0.0], None)["answer"] == "a"
+    now[0] += 1
+    cache.add([0.0, 0.0, 1.0], None, _result("c"))
+
+    assert len(cache) == 2
+    assert cache.lookup([0.0, 1.0, 0.0], None) is None
+    assert cache.lookup([1.0, 0.0, 0.0], None)["answer"] == "a"
+
+
+def test_cache_persists_and_clears(tmp_path):
+    path = tmp_path / "cache" / "q.db"
+    SemanticQueryCache(path=str(path)).add([0.6, 0.8], ["a.pdf"], _result("persisted"))
+
+    reloaded = SemanticQueryCache(path=str(path))
+    assert reloaded.lookup([0.6, 0.8], ["a.pdf"])["answer"] == "persisted"
+
+    reloaded.clear()
+    assert len(reloaded) == 0
+    assert SemanticQueryCache(path=str(path)).lookup([0.6, 0.8], ["a.pdf"]) is None
+
+
+def test_evictions_and_expiry_reach_the_file(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(semantic_cache.time, "time", lambda: now[0])
+    path = str(tmp_path / "q.db")
+    cache = SemanticQueryCache(path=path, max_size=2, ttl_seconds=60)
+    for i, vec in enumerate(([1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0])):
+        cache.add(vec, None, _result(str(i)))
+        now[0] += 1
+
+    reloaded = SemanticQueryCache(path=path, ttl_seconds=60)
+    assert reloaded.lookup([1.0, 0.0, 0.0], None) is None
+    assert [reloaded.lookup(v, None)["answer"] for v in ([0.0, 1.0, 0.0], [0.0, 0.0, 1.0])] == ["1", "2"]
+    assert reloaded._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] == 2
+
+    now[0] += 61
+    expired = SemanticQueryCache(path=path, ttl_seconds=60)
+    expired.load()
+    assert len(expired) == 0
+    assert expired._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] == 0
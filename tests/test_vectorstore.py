@@ -0,0 +1,28 @@
+import src.vectorstore as vectorstore
+
+
+class _FakeChroma:
+    created = 0
+
+    def __init__(self, persist_directory, embedding_function):
+        _FakeChroma.created += 1
+        self.embedding_function = embedding_function
+
+
+def test_chroma_handle_is_reused_until_reset(monkeypatch):
+    monkeypatch.setattr(vectorstore, "Chroma", _FakeChroma)
+    vectorstore.reset_chroma_vectorstore()
+    _FakeChroma.created = 0
+    embeddings = object()
+
+    first = vectorstore.get_chroma_vectorstore(embeddings)
+    assert vectorstore.get_chroma_vectorstore(embeddings) is first
+    assert _FakeChroma.created == 1
+
+    assert vectorstore.get_chroma_vectorstore(object()) is not first
+    assert _FakeChroma.created == 2
+
+    vectorstore.reset_chroma_vectorstore()
+    vectorstore.get_chroma_vectorstore(embeddings)
+    assert _FakeChroma.created == 3
+    vectorstore.reset_chroma_vectorstore()